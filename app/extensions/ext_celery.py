@@ -5,12 +5,27 @@
 @GitHub  : https://github.com/QIN2DIM
 @Desc    : Celery application configuration
 """
+import asyncio
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Coroutine, Iterator, TypeVar
 
+import redis
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init, worker_process_shutdown
+from loguru import logger
 
 from settings import settings
 
+ACCOUNT_LOCK_PREFIX = "epic-awesome-gamer:account-lock:"
+
+PROMOTION_PLANNER_INTERVAL = timedelta(hours=1)
+
+T = TypeVar("T")
+
+_worker_loop: asyncio.AbstractEventLoop | None = None
+
 
 def init_app():
     # Create Celery app instance
@@ -21,7 +36,6 @@ def init_app():
         timezone="UTC",
         enable_utc=True,
         worker_prefetch_multiplier=1,
-        worker_max_tasks_per_child=1,
         task_track_started=True,
         task_time_limit=settings.CELERY_TASK_TIME_LIMIT,
         task_soft_time_limit=settings.CELERY_TASK_SOFT_TIME_LIMIT,
@@ -29,17 +43,111 @@ def init_app():
         worker_concurrency=settings.CELERY_WORKER_CONCURRENCY,
     )
 
-    imports = ["schedule.epic_collect_games_task"]
+    imports = ["schedule.collect_epic_games_task"]
     beat_schedule = {
-        "epic_collect_games_task": {
-            "task": "schedule.epic_collect_games_task.epic_collect_games_task",
-            "schedule": crontab("1 */5 * * *"),
+        # 分发任务为每个账号投递一个独立的采集任务，由多个 worker 并行消费
+        "dispatch_collect_epic_games_task": {
+            "task": "schedule.collect_epic_games_task.dispatch_collect_epic_games_task",
+            "schedule": crontab(minute="1", hour="*/5"),
         }
     }
+    if settings.SCHEDULER_MODE == "promotion_window":
+        # 定期规划即将开始的免费窗口，分发任务退化为低频心跳
+        beat_schedule = {
+            "plan_promotion_windows_task": {
+                "task": "schedule.collect_epic_games_task.plan_promotion_windows_task",
+                "schedule": PROMOTION_PLANNER_INTERVAL,
+            },
+            "dispatch_collect_epic_games_task": {
+                "task": "schedule.collect_epic_games_task.dispatch_collect_epic_games_task",
+                "schedule": timedelta(hours=settings.SCHEDULER_HEARTBEAT_HOURS),
+            },
+        }
+        # Redis 会重新投递超过 visibility_timeout 仍未确认的 ETA 任务，需覆盖整个规划范围
+        celery_app.conf.update(
+            broker_transport_options={
+                "visibility_timeout": int(PROMOTION_PLANNER_INTERVAL.total_seconds()) * 3
+                + settings.PROMOTION_JITTER_SECONDS
+            }
+        )
     celery_app.conf.update(beat_schedule=beat_schedule, imports=imports)
 
+    # task: 每个任务后重建子进程，最稳妥但每次都要重新导入 playwright/camoufox 等依赖
+    # memory: 子进程常驻并复用事件循环，常驻内存超过阈值后再回收
+    if settings.CELERY_WORKER_RECYCLE_MODE == "task":
+        celery_app.conf.update(worker_max_tasks_per_child=1)
+    else:
+        celery_app.conf.update(
+            worker_max_memory_per_child=settings.CELERY_WORKER_MAX_MEMORY_PER_CHILD_MB * 1024
+        )
+
     # Import tasks to register them
     return celery_app
 
 
 ext_celery_app = init_app()
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """当前 worker 进程的事件循环，solo pool 等不会触发 worker_process_init 的场景下按需创建"""
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """在 worker 进程的常驻事件循环上执行协程，供同步的 Celery 任务调用"""
+    return get_worker_loop().run_until_complete(coro)
+
+
+@worker_process_init.connect
+def _init_worker_loop(**kwargs):
+    get_worker_loop()
+    logger.debug("Worker event loop initialized")
+
+
+@worker_process_shutdown.connect
+def _close_worker_loop(**kwargs):
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        return
+    try:
+        _worker_loop.run_until_complete(_worker_loop.shutdown_asyncgens())
+        _worker_loop.run_until_complete(_worker_loop.shutdown_default_executor())
+    finally:
+        _worker_loop.close()
+        _worker_loop = None
+
+
+def claim_once(key: str, ttl: int) -> bool:
+    """在 ttl 秒内仅首次调用返回 True，用于避免重复投递同一个计划任务"""
+    client = redis.Redis.from_url(settings.REDIS_URL)
+    try:
+        return bool(client.set(key, 1, nx=True, ex=ttl))
+    finally:
+        client.close()
+
+
+@contextmanager
+def account_lock(email: str) -> Iterator[bool]:
+    """
+    跨 worker 节点的账号互斥锁，保证同一账号的浏览器配置不会被同时打开
+
+    Returns: 是否成功获取锁，锁在任务硬超时后自动过期，避免 worker 崩溃后死锁
+    """
+    client = redis.Redis.from_url(settings.REDIS_URL)
+    lock = client.lock(
+        f"{ACCOUNT_LOCK_PREFIX}{email}", timeout=settings.CELERY_TASK_TIME_LIMIT, blocking=False
+    )
+    acquired = lock.acquire()
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except redis.exceptions.LockError as err:
+                logger.warning(f"Account lock already expired - {email=} {err=}")
+        client.close()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/7/27 10:18
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Shared async HTTP client for all non-browser Epic calls
+"""
+from contextlib import asynccontextmanager
+from importlib.util import find_spec
+from typing import AsyncIterator
+
+import httpx
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential,
+)
+
+from settings import settings
+
+# HTTP/2 needs the optional `h2` package (shipped with httpx[http2])
+HTTP2_AVAILABLE = find_spec("h2") is not None
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def init_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=60,
+    )
+
+    # The transport only retries failed connection attempts,
+    # retryable status codes are handled in `request_with_retry`
+    transport = httpx.AsyncHTTPTransport(
+        http2=HTTP2_AVAILABLE, limits=limits, retries=settings.HTTP_RETRIES
+    )
+
+    return httpx.AsyncClient(
+        transport=transport,
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS),
+        follow_redirects=True,
+    )
+
+
+@asynccontextmanager
+async def http_client_lifespan() -> AsyncIterator[httpx.AsyncClient]:
+    """Own the client for the lifetime of a deploy loop or a Celery task."""
+    client = init_client()
+    try:
+        yield client
+    finally:
+        await client.aclose()
+
+
+def _is_retryable(err: BaseException) -> bool:
+    if isinstance(err, httpx.HTTPStatusError):
+        return err.response.status_code in RETRY_STATUS_CODES
+    return isinstance(err, httpx.TransportError)
+
+
+async def request_with_retry(
+    client: httpx.AsyncClient, method: str, url: str, **kwargs
+) -> httpx.Response:
+    """Send a request, retrying transport errors and 429/5xx with exponential backoff."""
+    async for attempt in AsyncRetrying(
+        retry=retry_if_exception(_is_retryable),
+        stop=stop_after_attempt(max(1, settings.HTTP_RETRIES)),
+        wait=wait_exponential(multiplier=0.5, max=8),
+        reraise=True,
+    ):
+        with attempt:
+            resp = await client.request(method, url, **kwargs)
+            if resp.status_code in RETRY_STATUS_CODES:
+                resp.raise_for_status()
+            return resp
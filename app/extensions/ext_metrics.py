@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/3 11:52
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Optional Prometheus/OpenMetrics exporter
+
+Requires the optional `prometheus-client` package (`epic-awesome-gamer[metrics]`),
+every recorder degrades to a no-op when it is missing or METRICS_MODE=off.
+
+- http: serve the metrics on METRICS_PORT, used by the long-running deploy loop
+- textfile: rewrite METRICS_TEXTFILE after every run for the node_exporter textfile collector,
+  used by Celery workers. Set PROMETHEUS_MULTIPROC_DIR to aggregate prefork worker processes.
+"""
+import os
+
+from loguru import logger
+from playwright.async_api import BrowserContext, Frame, Response
+
+from profiler import RunProfile, add_phase_listener, add_run_listener
+from settings import settings
+
+try:
+    from prometheus_client import (
+        CollectorRegistry,
+        Counter,
+        Histogram,
+        start_http_server,
+        write_to_textfile,
+    )
+    from prometheus_client import multiprocess
+except ImportError:  # pragma: no cover
+    CollectorRegistry = None
+
+DURATION_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 900, 1200)
+
+_metrics: dict = {}
+_http_server_started = False
+
+
+def _registry():
+    # In multiprocess mode the samples live in PROMETHEUS_MULTIPROC_DIR,
+    # a dedicated registry merges them at collection time.
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    from prometheus_client import REGISTRY
+
+    return REGISTRY
+
+
+def _on_phase(path: str, elapsed: float, ok: bool):
+    name = path.rsplit("/", 1)[-1]
+    _metrics["phase_duration"].labels(phase=name).observe(elapsed)
+
+
+def _on_run(profile: RunProfile):
+    status = "success" if profile.ok else "failure"
+    _metrics["run_duration"].labels(status=status).observe(profile.elapsed or 0)
+
+
+def init_metrics() -> bool:
+    """Create the collectors once per process, return whether metrics are enabled."""
+    global _http_server_started
+
+    if settings.METRICS_MODE == "off":
+        return False
+    if CollectorRegistry is None:
+        logger.warning("METRICS_MODE is set but prometheus-client is not installed")
+        return False
+
+    if not _metrics:
+        _metrics.update(
+            run_duration=Histogram(
+                "eag_run_duration_seconds",
+                "Duration of an account run",
+                ["status"],
+                buckets=DURATION_BUCKETS,
+            ),
+            phase_duration=Histogram(
+                "eag_phase_duration_seconds",
+                "Duration of a run phase",
+                ["phase"],
+                buckets=DURATION_BUCKETS,
+            ),
+            captcha_attempts=Counter(
+                "eag_captcha_attempts_total", "hCaptcha challenges handled", ["result"]
+            ),
+            captcha_solve_duration=Histogram(
+                "eag_captcha_solve_seconds", "hCaptcha solve latency", buckets=DURATION_BUCKETS
+            ),
+            page_navigations=Counter("eag_page_navigations_total", "Main frame navigations"),
+            bytes_downloaded=Counter(
+                "eag_bytes_downloaded_total", "Response bytes announced by Content-Length"
+            ),
+            launches_avoided=Counter(
+                "eag_browser_launches_avoided_total", "Browser launches skipped by the preflight"
+            ),
+            claims=Counter("eag_claims_total", "Free games claimed", ["email"]),
+        )
+        add_phase_listener(_on_phase)
+        add_run_listener(_on_run)
+
+    if settings.METRICS_MODE == "http" and not _http_server_started:
+        start_http_server(settings.METRICS_PORT, registry=_registry())
+        _http_server_started = True
+        logger.debug(f"Metrics endpoint started - port={settings.METRICS_PORT}")
+
+    return True
+
+
+def flush_metrics():
+    if settings.METRICS_MODE != "textfile" or not _metrics:
+        return
+    settings.METRICS_TEXTFILE.parent.mkdir(parents=True, exist_ok=True)
+    write_to_textfile(str(settings.METRICS_TEXTFILE), _registry())
+
+
+def record_launches_avoided(count: int):
+    if _metrics and count:
+        _metrics["launches_avoided"].inc(count)
+
+
+def record_captcha(success: bool, latency: float):
+    """Count a challenge by the solver's verdict, AgentV reports failures without raising."""
+    if _metrics:
+        _metrics["captcha_attempts"].labels(result="success" if success else "failure").inc()
+        _metrics["captcha_solve_duration"].observe(latency)
+
+
+def record_claims(email: str, count: int):
+    if _metrics and count:
+        _metrics["claims"].labels(email=email).inc(count)
+
+
+def attach_context_metrics(context: BrowserContext):
+    """Count main-frame navigations and downloaded bytes of every page in the context."""
+    if not _metrics:
+        return
+
+    def _on_navigated(frame: Frame):
+        if frame.parent_frame is None:
+            _metrics["page_navigations"].inc()
+
+    def _on_response(response: Response):
+        # Content-Length is read from the already received headers, no extra IPC round-trip
+        if size := response.headers.get("content-length"):
+            if size.isdigit():
+                _metrics["bytes_downloaded"].inc(int(size))
+
+    def _on_page(page):
+        page.on("framenavigated", _on_navigated)
+
+    for page in context.pages:
+        _on_page(page)
+    context.on("page", _on_page)
+    context.on("response", _on_response)
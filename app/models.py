@@ -4,6 +4,7 @@
 # GitHub     : https://github.com/QIN2DIM
 # Description:
 
+from datetime import datetime
 from typing import List
 
 from pydantic import BaseModel, Field
@@ -21,6 +22,12 @@ class Order(BaseModel):
     items: List[OrderItem] = Field(default_factory=list)
 
 
+class OrderHistory(BaseModel):
+    orders: List[Order] = Field(default_factory=list)
+    nextPageToken: str | None = None
+    total: int | None = None
+
+
 class CompletedOrder(BaseModel):
     offerId: str
     namespace: str
@@ -33,3 +40,14 @@ class PromotionGame(BaseModel):
     description: str
     offerType: str
     url: str
+
+
+class PromotionWindow(BaseModel):
+    """A free (100% off) offer window of the promotions feed"""
+
+    title: str
+    id: str
+    namespace: str
+    startDate: datetime
+    endDate: datetime
+    upcoming: bool = False
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/2 10:24
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Run-level phase profiler
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Iterator, List
+
+from loguru import logger
+
+from settings import settings
+
+_current_run: ContextVar["RunProfile | None"] = ContextVar("current_run", default=None)
+_current_phase: ContextVar[str | None] = ContextVar("current_phase", default=None)
+
+# Observers notified when a phase or a run ends, e.g. the metrics exporter
+_phase_listeners: List[Callable[[str, float, bool], None]] = []
+_run_listeners: List[Callable[["RunProfile"], None]] = []
+
+
+class RunProfile:
+    """Collect the phase timings of one account run."""
+
+    def __init__(self, email: str | None = None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.email = email
+        self.started_at = time.time()
+        self.elapsed: float | None = None
+        self.ok: bool | None = None
+        self.phases: List[dict] = []
+        self.active: List[str] = []
+        self.timed_out_phase: str | None = None
+
+    def add(self, path: str, elapsed: float, ok: bool):
+        self.phases.append({"phase": path, "elapsed": elapsed, "ok": ok})
+
+    def summary(self) -> dict:
+        totals = {}
+        for p in self.phases:
+            item = totals.setdefault(p["phase"], {"count": 0, "total": 0.0, "max": 0.0})
+            item["count"] += 1
+            item["total"] = round(item["total"] + p["elapsed"], 3)
+            item["max"] = max(item["max"], p["elapsed"])
+        return totals
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "email": self.email,
+            "started_at": self.started_at,
+            "elapsed": self.elapsed,
+            "ok": self.ok,
+            "timed_out_phase": self.timed_out_phase,
+            "phases": self.phases,
+            "summary": self.summary(),
+        }
+
+
+def add_phase_listener(listener: Callable[[str, float, bool], None]):
+    if listener not in _phase_listeners:
+        _phase_listeners.append(listener)
+
+
+def add_run_listener(listener: Callable[[RunProfile], None]):
+    if listener not in _run_listeners:
+        _run_listeners.append(listener)
+
+
+def _notify(listeners: list, *args):
+    for listener in listeners:
+        try:
+            listener(*args)
+        except Exception as err:
+            logger.warning(f"Profiler listener failed - {listener=} {err=}")
+
+
+def current_run() -> RunProfile | None:
+    return _current_run.get()
+
+
+def current_phase() -> str | None:
+    return _current_phase.get()
+
+
+@contextmanager
+def run_profile(email: str | None = None) -> Iterator[RunProfile]:
+    """
+    Open a run record, every phase entered in this context (and in tasks spawned from it)
+    is attached to it. The record is emitted to the serialize sink when the run ends.
+    """
+    profile = RunProfile(email)
+    token = _current_run.set(profile)
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.elapsed = round(time.perf_counter() - start, 3)
+        _current_run.reset(token)
+        _notify(_run_listeners, profile)
+        logger.bind(run_timing=profile.to_dict()).info(
+            f"Run timing - run_id={profile.run_id} email={email} elapsed={profile.elapsed}s"
+        )
+
+
+@asynccontextmanager
+async def phase(name: str, timeout: float | None = None) -> AsyncIterator[None]:
+    """
+    Time a phase of the current run, nested phases are recorded as `parent/child`.
+
+    The phase is cancelled with TimeoutError after `timeout` seconds,
+    which defaults to the PHASE_TIMEOUT_SECONDS entry of the phase name.
+    """
+    parent = _current_phase.get()
+    path = f"{parent}/{name}" if parent else name
+    token = _current_phase.set(path)
+    profile = _current_run.get()
+    if profile:
+        profile.active.append(path)
+    if timeout is None:
+        timeout = settings.PHASE_TIMEOUT_SECONDS.get(name)
+
+    start = time.perf_counter()
+    ok = False
+    try:
+        async with asyncio.timeout(timeout) as deadline:
+            yield
+        ok = True
+    except TimeoutError:
+        # Only the deadline of this phase marks it, not a recoverable wait_for inside it
+        if deadline.expired():
+            if profile and not profile.timed_out_phase:
+                profile.timed_out_phase = path
+            logger.warning(f"Phase timed out - {path} {timeout=}s")
+        raise
+    finally:
+        elapsed = round(time.perf_counter() - start, 3)
+        _current_phase.reset(token)
+        if profile:
+            profile.active.remove(path)
+            profile.add(path, elapsed, ok)
+        _notify(_phase_listeners, path, elapsed, ok)
+        logger.debug(f"Phase finished - {path} {elapsed=}s {ok=}")
+
+
+def profile_phase(name: str):
+    """Decorator version of `phase` for coroutine functions."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with phase(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
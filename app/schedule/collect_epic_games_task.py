@@ -5,21 +5,33 @@
 @GitHub  : https://github.com/QIN2DIM
 @Desc    :
 """
-import asyncio
+import math
 import sys
-from contextlib import suppress
-from typing import List
+from collections import Counter
+from typing import Dict, List
 
-from browserforge.fingerprints import Screen
-from camoufox import AsyncCamoufox
+from celery import chord
+from celery.signals import worker_init, worker_process_init
+from loguru import logger
 from playwright.async_api import Page
-from playwright.async_api import ViewportSize
 
+from extensions.ext_httpx import http_client_lifespan
+from extensions.ext_metrics import init_metrics
+from services.account_runner_service import run_accounts
+from services.agent_factory_service import agent_factory
 from services.epic_authorization_service import EpicAuthorization
-from services.epic_games_service import EpicAgent
-from settings import LOG_DIR, RECORD_DIR, settings
+from services.epic_games_service import EpicAgent, get_promotion_windows
+from services.stagger_service import log_queue, plan_staggered
+from schedule.promotion_window_scheduler import plan_runs
+from settings import LOG_DIR, EpicAccount, settings
 from utils import init_log
-from extensions.ext_celery import ext_celery_app
+from extensions.ext_celery import (
+    PROMOTION_PLANNER_INTERVAL,
+    account_lock,
+    claim_once,
+    ext_celery_app,
+    run_async,
+)
 
 init_log(
     runtime=LOG_DIR.joinpath("runtime.log"),
@@ -69,35 +81,115 @@ async def authorize(page: Page):
     await agent.invoke()
 
 
+HEADLESS = "virtual" if "linux" in sys.platform else False
+
+
+@worker_init.connect
+@worker_process_init.connect
+def _warm_up_agent(**kwargs):
+    # 主进程预热后 fork 出的子进程直接继承，solo pool 等场景在子进程内补充预热
+    agent_factory.warm_up()
+
+
+async def _run_accounts(accounts: List[EpicAccount] | None = None) -> Dict[str, bool]:
+    init_metrics()
+
+    # 每个账号在 run_accounts 内部各自受 TASK_TIMEOUT_SECONDS 约束
+    async with http_client_lifespan() as client:
+        return await run_accounts(headless=HEADLESS, client=client, accounts=accounts)
+
+
+# 单个任务处理全部账号时按并发批次放大任务时限，每个账号仍受各自的截止时间约束
+FLEET_BATCHES = max(
+    1,
+    math.ceil(
+        len(settings.accounts)
+        / max(1, min(settings.MAX_CONCURRENT_ACCOUNTS, settings.BROWSER_POOL_CONTEXTS))
+    ),
+)
+
+
+@ext_celery_app.task(
+    queue="epic-awesome-gamer",
+    soft_time_limit=settings.CELERY_TASK_SOFT_TIME_LIMIT * FLEET_BATCHES,
+    time_limit=settings.CELERY_TASK_TIME_LIMIT * FLEET_BATCHES,
+)
+def collect_epic_games_task() -> Dict[str, bool]:
+    """在单个任务中依次处理全部账号"""
+    return run_async(_run_accounts())
+
+
+@ext_celery_app.task(queue="epic-awesome-gamer")
+def dispatch_collect_epic_games_task() -> int:
+    """为每个账号投递一个采集任务，全部完成后由 chord 汇总结果"""
+    accounts = settings.accounts
+    if not accounts:
+        logger.error("No Epic account configured, set EPIC_EMAIL/EPIC_PASSWORD or EPIC_ACCOUNTS")
+        return 0
+
+    # 按固定偏移错开各账号的开始时间，并发上限由 worker_concurrency 决定
+    plan = plan_staggered(accounts)
+    log_queue(plan)
+
+    # 任务参数只携带邮箱，凭据由 worker 从自身配置中读取，不经过消息队列
+    header = [collect_account_games_task.s(r.email).set(countdown=r.offset) for r in plan]
+    chord(header)(summarize_collect_results_task.s())
+
+    logger.info(f"Dispatched collect tasks - accounts={len(accounts)}")
+    return len(accounts)
+
+
+@ext_celery_app.task(queue="epic-awesome-gamer")
+def plan_promotion_windows_task() -> int:
+    """为即将开始的免费窗口投递延时执行的单账号采集任务"""
+    # 规划范围覆盖两个周期，单次 beat 延迟不会漏掉窗口，重复规划由 claim_once 去重
+    horizon = PROMOTION_PLANNER_INTERVAL * 2
+    windows = run_async(get_promotion_windows())
+
+    dispatched = 0
+    for planned in plan_runs(windows, settings.accounts, horizon=horizon):
+        ttl = int(horizon.total_seconds()) + settings.PROMOTION_JITTER_SECONDS
+        if not claim_once(f"epic-awesome-gamer:{planned.job_id}", ttl):
+            continue
+        collect_account_games_task.apply_async(args=[planned.email], eta=planned.run_at)
+        dispatched += 1
+        logger.debug(
+            f"Run planned - email={planned.email} run_at={planned.run_at.isoformat()} "
+            f"titles={planned.titles}"
+        )
+
+    return dispatched
+
+
 @ext_celery_app.task(queue="epic-awesome-gamer")
-async def collect_epic_games_task():
-    headless = "virtual" if "linux" in sys.platform else False
+def collect_account_games_task(email: str) -> dict:
+    account = next((a for a in settings.accounts if a.email == email), None)
+    if not account:
+        logger.error(f"Account is not configured on this worker - {email=}")
+        return {"email": email, "status": "missing"}
 
-    async with AsyncCamoufox(
-        persistent_context=True,
-        user_data_dir=settings.user_data_dir,
-        screen=Screen(max_width=1920, max_height=1080, min_height=1080, min_width=1920),
-        record_video_dir=RECORD_DIR,
-        record_video_size=ViewportSize(width=1920, height=1080),
-        humanize=0.2,
-        headless=headless,
-    ) as browser:
-        page = browser.pages[0] if browser.pages else await browser.new_page()
+    with account_lock(email) as acquired:
+        if not acquired:
+            logger.warning(f"Account is already being processed by another worker - {email=}")
+            return {"email": email, "status": "locked"}
 
-        agent = EpicAuthorization(page)
-        await agent.invoke()
+        # 捕获异常以保证 chord 回调总能拿到完整的结果列表
+        try:
+            outcome = run_async(_run_accounts([account]))
+        except Exception as err:
+            logger.opt(exception=err).error(f"Account task failed - {email=}")
+            return {"email": email, "status": "error"}
 
-        game_page = await browser.new_page()
-        agent = EpicAgent(game_page)
-        await agent.collect_epic_games()
+    return {"email": email, "status": "success" if outcome.get(email) else "failure"}
 
-        with suppress(Exception):
-            for p in browser.pages:
-                await p.close()
 
-        with suppress(Exception):
-            await browser.close()
+@ext_celery_app.task(queue="epic-awesome-gamer")
+def summarize_collect_results_task(results: List[dict]) -> dict:
+    summary = dict(Counter(r["status"] for r in results))
+    failed = [r["email"] for r in results if r["status"] != "success"]
+    logger.bind(collect_results=results).info(f"Collect tasks finished - {summary=} {failed=}")
+    return {"summary": summary, "results": results}
 
 
 if __name__ == '__main__':
-    asyncio.run(collect_epic_games_task())
+    collect_epic_games_task()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/6 09:40
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Schedule runs from the start dates of the free promotion windows
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from loguru import logger
+from pydantic import BaseModel
+
+from models import PromotionWindow
+from services.epic_games_service import get_promotion_windows
+from services.stagger_service import account_offset
+from settings import EpicAccount, settings
+
+
+class PlannedRun(BaseModel):
+    email: str
+    run_at: datetime
+    window_start: datetime
+    titles: List[str]
+
+    @property
+    def job_id(self) -> str:
+        return f"promotion_window:{self.window_start:%Y%m%dT%H%M}:{self.email}"
+
+
+def plan_runs(
+    windows: List[PromotionWindow],
+    accounts: List[EpicAccount],
+    now: datetime | None = None,
+    horizon: timedelta | None = None,
+) -> List[PlannedRun]:
+    """
+    为每个尚未开始领取的免费窗口，给每个账号安排一次运行
+
+    Args:
+        windows: 促销数据中的免费窗口
+        accounts: 需要运行的账号
+        now: 当前时间（UTC）
+        horizon: 只安排该时间范围内的窗口，默认不限制
+
+    Returns: 按运行时间排序的计划
+    """
+    now = now or datetime.now(timezone.utc)
+    delay = timedelta(seconds=settings.PROMOTION_START_DELAY_SECONDS)
+
+    # 同一周的多个免费游戏通常共享同一个 startDate
+    starts: Dict[datetime, List[str]] = {}
+    for window in windows:
+        base = window.startDate + delay
+        if base <= now or (horizon is not None and base > now + horizon):
+            continue
+        starts.setdefault(window.startDate, []).append(window.title)
+
+    planned: List[PlannedRun] = []
+    for start, titles in starts.items():
+        for account in accounts:
+            # 错开各账号的启动时间，避免在同一时刻集中登录
+            offset = account_offset(account.email, settings.PROMOTION_JITTER_SECONDS)
+            jitter = timedelta(seconds=offset)
+            planned.append(
+                PlannedRun(
+                    email=account.email,
+                    run_at=start + delay + jitter,
+                    window_start=start,
+                    titles=titles,
+                )
+            )
+    return sorted(planned, key=lambda r: r.run_at)
+
+
+class PromotionWindowScheduler:
+    """
+    APScheduler 版本的窗口调度：在每个新窗口开始后为每个账号安排一次运行，
+    其余时间仅保留低频的心跳运行，并借此刷新窗口数据
+    """
+
+    def __init__(
+        self,
+        scheduler: AsyncIOScheduler,
+        run: Callable[..., Awaitable],
+        client: httpx.AsyncClient | None = None,
+    ):
+        """
+        Args:
+            scheduler:
+            run: 执行采集的协程函数，接受 accounts 与 stagger 关键字参数
+            client: 共享的 HTTP 客户端，用于刷新促销数据
+        """
+        self.scheduler = scheduler
+        self.run = run
+        self.client = client
+
+    def start(self):
+        self.scheduler.add_job(
+            self._heartbeat,
+            trigger=IntervalTrigger(hours=settings.SCHEDULER_HEARTBEAT_HOURS),
+            id="promotion_window_heartbeat",
+            name="promotion_window_heartbeat",
+            replace_existing=True,
+            max_instances=1,
+        )
+
+    async def refresh(self):
+        try:
+            windows = await get_promotion_windows(self.client)
+        except Exception as err:
+            logger.warning(f"Failed to refresh promotion windows - {err}")
+            return
+
+        for planned in plan_runs(windows, settings.accounts):
+            self.scheduler.add_job(
+                self._run_planned,
+                trigger=DateTrigger(run_date=planned.run_at),
+                id=planned.job_id,
+                name=planned.job_id,
+                args=[planned.email],
+                replace_existing=True,
+                misfire_grace_time=settings.PROMOTION_JITTER_SECONDS + 3600,
+            )
+            logger.debug(
+                f"Run planned - email={planned.email} run_at={planned.run_at.isoformat()} "
+                f"titles={planned.titles}"
+            )
+
+    async def _heartbeat(self):
+        # 心跳与计划运行重叠时，由 account_gate 保证同一账号不会被同时打开
+        await self.run(stagger=True)
+        await self.refresh()
+
+    async def _run_planned(self, email: str):
+        account = next((a for a in settings.accounts if a.email == email), None)
+        if not account:
+            logger.warning(f"Planned account is no longer configured - {email=}")
+            return
+
+        await self.run(accounts=[account])
+        await self.refresh()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/7/26 14:40
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Drive one or many Epic accounts through the authorization and collection workflow
+"""
+import asyncio
+from contextlib import suppress
+from datetime import datetime
+from typing import Dict, List
+
+import httpx
+from browserforge.fingerprints import Screen
+from camoufox import AsyncCamoufox
+from loguru import logger
+from playwright.async_api import BrowserContext
+
+from extensions.ext_metrics import attach_context_metrics, flush_metrics
+from profiler import run_profile
+from services.browser_pool_service import BrowserPool
+from services.epic_authorization_service import EpicAuthorization
+from services.epic_games_service import EpicAgent
+from services.network_trace_service import NetworkTracer
+from services.preflight_service import preflight
+from services.profile_service import maybe_prune_profile
+from services.recording_service import RecordingPolicy, sweep_recordings
+from services.resource_router_service import ResourceRouter
+from services.stagger_service import account_gate, log_queue, plan_staggered, wait_until
+from services.supervisor_service import BrowserProcesses, supervise
+from settings import EpicAccount, settings
+
+
+async def collect_account_games(
+    context: BrowserContext, account: EpicAccount, client: httpx.AsyncClient | None = None
+) -> bool:
+    """
+    Authorize the account in the given context and collect the weekly free games.
+
+    Returns: whether the workflow finished without errors
+    """
+    router = ResourceRouter() if settings.ENABLE_RESOURCE_BLOCKING else None
+    if router:
+        await router.install(context)
+
+    attach_context_metrics(context)
+
+    tracer = NetworkTracer(account.email) if settings.NETWORK_TRACE_ENABLED else None
+    if tracer:
+        tracer.attach(context)
+
+    try:
+        page = context.pages[0] if context.pages else await context.new_page()
+
+        logger.debug(f"Initiating Epic Games authentication - email={account.email}")
+        agent = EpicAuthorization(page, account=account)
+        if not await agent.invoke():
+            logger.error(f"Authentication failed - email={account.email}")
+            return False
+        logger.debug("Authentication completed")
+
+        # Execute a free games collection on new page
+        logger.debug("Starting free games collection process")
+        game_page = await context.new_page()
+        agent = EpicAgent(game_page, client=client, account=account)
+        is_success = await agent.collect_epic_games()
+        logger.debug("Free games collection completed")
+    finally:
+        if tracer:
+            tracer.dump()
+
+    if router:
+        logger.debug(f"Blocked requests - email={account.email} aborted={dict(router.aborted)}")
+
+    return is_success
+
+
+async def _collect_in_persistent_browser(
+    account: EpicAccount,
+    headless: bool | str,
+    client: httpx.AsyncClient | None,
+    recording: RecordingPolicy,
+    processes: BrowserProcesses,
+) -> bool:
+    async with processes.launch(
+        AsyncCamoufox(
+            persistent_context=True,
+            user_data_dir=account.user_data_dir,
+            screen=Screen(max_width=1920, max_height=1080, min_height=1080, min_width=1920),
+            humanize=0.2,
+            headless=headless,
+            **recording.context_options(),
+        )
+    ) as browser:
+        logger.debug("Browser initialized successfully")
+        recording.attach(browser)
+
+        is_success = await collect_account_games(browser, account, client=client)
+
+        # Keep a compact snapshot for BROWSER_PROFILE_MODE=storage_state
+        with suppress(Exception):
+            await browser.storage_state(path=account.storage_state_path)
+
+        # Cleanup browser resources
+        logger.debug("Cleaning up browser resources")
+        with suppress(Exception):
+            for p in browser.pages:
+                await p.close()
+
+        with suppress(Exception):
+            await browser.close()
+
+    return is_success
+
+
+async def run_persistent_account(
+    account: EpicAccount, headless: bool | str = True, client: httpx.AsyncClient | None = None
+) -> bool:
+    """Single account mode, reuse the full persistent Firefox profile of the account."""
+    await asyncio.to_thread(maybe_prune_profile, account.user_data_dir)
+
+    recording = RecordingPolicy()
+    processes = BrowserProcesses()
+    is_success = False
+
+    with run_profile(account.email) as profile:
+        try:
+            result = await supervise(
+                _collect_in_persistent_browser(account, headless, client, recording, processes),
+                label=f"email={account.email}",
+                profile=profile,
+                processes=processes,
+            )
+            is_success = result is True
+        finally:
+            profile.ok = is_success
+            await recording.finalize(failed=not is_success)
+
+    return is_success
+
+
+async def run_account_pool(
+    accounts: List[EpicAccount],
+    headless: bool | str = True,
+    client: httpx.AsyncClient | None = None,
+    start_at: Dict[str, datetime] | None = None,
+) -> Dict[str, bool]:
+    """
+    Multi account mode, drive all accounts concurrently through a bounded BrowserPool.
+
+    Accounts listed in `start_at` wait for their planned start before taking a context.
+    Every account runs under its own deadline, the shared browsers are reaped by the pool.
+    """
+    start_at = start_at or {}
+
+    async with BrowserPool(headless=headless) as pool:
+
+        async def _collect(account: EpicAccount, recording: RecordingPolicy) -> bool:
+            async with pool.context(account, **recording.context_options()) as context:
+                recording.attach(context)
+                return await collect_account_games(context, account, client=client)
+
+        async def _run(account: EpicAccount) -> bool:
+            if planned := start_at.get(account.email):
+                await wait_until(planned)
+
+            recording = RecordingPolicy()
+            is_success = False
+            async with account_gate.slot(account.email):
+                with run_profile(account.email) as profile:
+                    try:
+                        result = await supervise(
+                            _collect(account, recording),
+                            label=f"email={account.email}",
+                            profile=profile,
+                        )
+                        is_success = result is True
+                    finally:
+                        profile.ok = is_success
+                        await recording.finalize(failed=not is_success)
+            return is_success
+
+        results = await asyncio.gather(*[_run(a) for a in accounts], return_exceptions=True)
+
+    outcome = {}
+    for account, result in zip(accounts, results):
+        if isinstance(result, BaseException):
+            logger.opt(exception=result).error(f"Account task failed - email={account.email}")
+        outcome[account.email] = result is True
+    return outcome
+
+
+async def run_accounts(
+    headless: bool | str = True,
+    client: httpx.AsyncClient | None = None,
+    accounts: List[EpicAccount] | None = None,
+    stagger: bool = False,
+) -> Dict[str, bool]:
+    """
+    Args:
+        headless:
+        client: 共享的 HTTP 客户端
+        accounts: 需要处理的账号，默认为全部已配置的账号
+        stagger: 是否按 STAGGER_WINDOW_SECONDS 内的固定偏移错开各账号的启动时间
+
+    Returns: 每个账号的执行结果，被预检跳过的账号视为成功
+    """
+    accounts = accounts or settings.accounts
+    if not accounts:
+        logger.error("No Epic account configured, set EPIC_EMAIL/EPIC_PASSWORD or EPIC_ACCOUNTS")
+        return {}
+
+    await asyncio.to_thread(sweep_recordings)
+
+    outcome = {account.email: True for account in accounts}
+
+    if settings.ENABLE_PREFLIGHT:
+        accounts = await preflight(accounts, client=client)
+        if not accounts:
+            logger.success("All week-free games are already in the library")
+            flush_metrics()
+            return outcome
+
+    plan = plan_staggered(accounts) if stagger else []
+    if plan:
+        log_queue(plan)
+        # 在第一个账号到点之前不启动浏览器
+        await wait_until(plan[0].start_at)
+
+    try:
+        if settings.EPIC_ACCOUNTS or settings.BROWSER_PROFILE_MODE == "storage_state":
+            logger.debug(f"Running {len(accounts)} accounts through the browser pool")
+            start_at = {r.email: r.start_at for r in plan}
+            outcome.update(
+                await run_account_pool(
+                    accounts, headless=headless, client=client, start_at=start_at
+                )
+            )
+        else:
+            account = accounts[0]
+            async with account_gate.slot(account.email):
+                outcome[account.email] = await run_persistent_account(
+                    account, headless=headless, client=client
+                )
+    finally:
+        flush_metrics()
+
+    return outcome
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/7 16:20
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Process-level AgentV factory with a one-time warm-up
+"""
+import time
+
+from hcaptcha_challenger.agent import AgentV
+from loguru import logger
+from playwright.async_api import Page
+
+from services.captcha_telemetry_service import CaptchaSolver, adaptive_agent_config
+from settings import EpicSettings, settings
+
+# The adaptive config reads the prompt statistics from disk, refresh it at most this often
+CONFIG_TTL_SECONDS = 300
+
+
+class AgentFactory:
+    """
+    The solver itself is remote (Gemini), so an AgentV instance is cheap: its tools only keep
+    the API key. The cold cost of a run is everything around it, done once per process here:
+
+    - the solver import graph (google-genai, OpenCV, matplotlib, msgpack)
+    - the matplotlib font cache, which is built on first use in a fresh container
+    - the cache/challenge/response directories and the adaptive agent config
+
+    Prefork workers that warm up before forking share the result copy-on-write.
+    """
+
+    def __init__(self, config_ttl: float = CONFIG_TTL_SECONDS):
+        self.config_ttl = config_ttl
+        self.warm_up_seconds: float | None = None
+
+        self._config: EpicSettings | None = None
+        self._config_at: float = 0
+
+    @property
+    def is_warm(self) -> bool:
+        return self.warm_up_seconds is not None
+
+    def warm_up(self) -> float:
+        """Returns: the warm-up cost in seconds, paid only on the first call"""
+        if self.is_warm:
+            return self.warm_up_seconds
+
+        start = time.perf_counter()
+
+        # AgentV draws its debug grids with pyplot, touching the font manager builds the cache
+        try:
+            from matplotlib import font_manager
+
+            font_manager.findfont("DejaVu Sans")
+        except Exception as err:
+            logger.warning(f"Failed to warm up matplotlib - {err}")
+
+        for path in (settings.cache_dir, settings.challenge_dir, settings.captcha_response_dir):
+            path.mkdir(parents=True, exist_ok=True)
+
+        self.config(refresh=True)
+
+        self.warm_up_seconds = round(time.perf_counter() - start, 3)
+        logger.debug(f"Captcha agent warmed up - elapsed={self.warm_up_seconds}s")
+        return self.warm_up_seconds
+
+    def config(self, refresh: bool = False) -> EpicSettings:
+        if refresh or self._config is None or time.monotonic() - self._config_at > self.config_ttl:
+            self._config = adaptive_agent_config()
+            self._config_at = time.monotonic()
+        return self._config
+
+    def create(self, page: Page) -> AgentV:
+        self.warm_up()
+        return AgentV(page=page, agent_config=self.config())
+
+    def solver(self, page: Page, label: str, email: str | None = None) -> CaptchaSolver:
+        return CaptchaSolver(page, label=label, email=email, agent=self.create(page))
+
+
+agent_factory = AgentFactory()
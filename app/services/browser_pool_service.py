@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/7/26 14:02
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Shared Camoufox browser processes with isolated per-account contexts
+"""
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
+from typing import AsyncIterator, List
+
+from browserforge.fingerprints import Screen
+from camoufox import AsyncCamoufox
+from loguru import logger
+from playwright.async_api import Browser, BrowserContext, ViewportSize
+
+from services.supervisor_service import TEARDOWN_GRACE_SECONDS, BrowserProcesses
+from settings import EpicAccount, settings
+
+
+class BrowserPool:
+    """
+    A bounded pool of browser contexts spread over a small number of Camoufox processes.
+
+    Every account gets a fresh, isolated context whose cookies and localStorage are restored
+    from (and written back to) `EpicAccount.storage_state_path`, so accounts never share a
+    session while sharing the expensive browser process.
+    """
+
+    def __init__(
+        self,
+        *,
+        headless: bool | str = True,
+        processes: int | None = None,
+        contexts: int | None = None,
+    ):
+        self.headless = headless
+
+        contexts = max(1, contexts or settings.BROWSER_POOL_CONTEXTS)
+        processes = max(1, processes or settings.BROWSER_POOL_PROCESSES)
+
+        # Never boot more browsers than there are contexts to put in them
+        self._processes = min(processes, contexts)
+        self._semaphore = asyncio.Semaphore(contexts)
+
+        self._stack = AsyncExitStack()
+        self.processes = BrowserProcesses()
+        self._browsers: List[Browser] = []
+        self._load: List[int] = []
+
+    async def __aenter__(self) -> "BrowserPool":
+        for i in range(self._processes):
+            browser = await self._stack.enter_async_context(
+                self.processes.launch(
+                    AsyncCamoufox(
+                        screen=Screen(
+                            max_width=1920, max_height=1080, min_height=1080, min_width=1920
+                        ),
+                        humanize=0.2,
+                        headless=self.headless,
+                    )
+                )
+            )
+            self._browsers.append(browser)
+            self._load.append(0)
+            logger.debug(f"Browser process launched - index={i}")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        # A hung browser blocks its own close(), the pool owns the processes and reaps them
+        with suppress(Exception):
+            async with asyncio.timeout(TEARDOWN_GRACE_SECONDS):
+                await self._stack.aclose()
+        await asyncio.to_thread(self.processes.reap)
+        self._browsers.clear()
+        self._load.clear()
+
+    def _pick_browser(self) -> int:
+        return self._load.index(min(self._load))
+
+    @asynccontextmanager
+    async def context(self, account: EpicAccount, **options) -> AsyncIterator[BrowserContext]:
+        """
+        Args:
+            account: 账号的存储状态会在上下文打开时恢复，关闭时写回
+            **options: 额外的 new_context 参数，例如录像配置
+        """
+        async with self._semaphore:
+            index = self._pick_browser()
+            self._load[index] += 1
+
+            state_path = account.storage_state_path
+            context = await self._browsers[index].new_context(
+                storage_state=state_path if state_path.is_file() else None,
+                viewport=ViewportSize(width=1920, height=1080),
+                **options,
+            )
+            logger.debug(f"Browser context opened - email={account.email} browser={index}")
+
+            try:
+                yield context
+            finally:
+                with suppress(Exception):
+                    await context.storage_state(path=state_path)
+                with suppress(Exception):
+                    await context.close()
+                self._load[index] -= 1
+                logger.debug(f"Browser context closed - email={account.email}")
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/7 10:48
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : hCaptcha solve telemetry and adaptive prompt skipping
+"""
+import asyncio
+import json
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import Dict, List
+
+from hcaptcha_challenger.agent import AgentV
+from loguru import logger
+from playwright.async_api import Page, Response
+from pydantic import BaseModel, Field
+
+from extensions.ext_metrics import record_captcha
+from settings import HCAPTCHA_DIR, EpicSettings, settings
+
+TELEMETRY_DIR = HCAPTCHA_DIR.joinpath("telemetry")
+
+URL_GETCAPTCHA = "/getcaptcha/"
+URL_CHECKCAPTCHA = "/checkcaptcha/"
+
+
+class ChallengeRound(BaseModel):
+    """One getcaptcha task and its checkcaptcha verdict"""
+
+    request_type: str = "unknown"
+    prompt: str = "unknown"
+    passed: bool | None = None  # None: refreshed or never submitted
+
+
+class ChallengeRecord(BaseModel):
+    label: str
+    email: str | None = None
+    started_at: float
+    latency: float
+    signal: str
+    success: bool
+    rounds: List[ChallengeRound] = Field(default_factory=list)
+
+
+class PromptStats(BaseModel):
+    request_type: str = "unknown"
+    seen: int = 0
+    checked: int = 0
+    passed: int = 0
+    recent: List[bool] = Field(default_factory=list)  # latest verdicts, oldest first
+    last_checked_at: float | None = None
+
+    @property
+    def success_rate(self) -> float | None:
+        """Success rate over the recent verdicts, so solver upgrades show up in the stats"""
+        return sum(self.recent) / len(self.recent) if self.recent else None
+
+    def add_verdict(self, passed: bool, window: int):
+        self.checked += 1
+        self.passed += int(passed)
+        self.recent = [*self.recent, passed][-max(1, window) :]
+        self.last_checked_at = time.time()
+
+
+class CaptchaTelemetryStore:
+    """
+    - records.jsonl：每次 wait_for_challenge 的完整记录
+    - prompt_stats.json：按提示词聚合的出现、提交与通过次数
+    """
+
+    def __init__(self, directory: Path = TELEMETRY_DIR):
+        self.records_path = directory.joinpath("records.jsonl")
+        self.stats_path = directory.joinpath("prompt_stats.json")
+
+    def load_stats(self) -> Dict[str, PromptStats]:
+        with suppress(Exception):
+            data = json.loads(self.stats_path.read_text(encoding="utf8"))
+            return {prompt: PromptStats(**item) for prompt, item in data.items()}
+        return {}
+
+    def add(self, record: ChallengeRecord):
+        stats = self.load_stats()
+        for r in record.rounds:
+            item = stats.setdefault(r.prompt, PromptStats(request_type=r.request_type))
+            item.seen += 1
+            if r.passed is not None:
+                item.add_verdict(r.passed, window=settings.CAPTCHA_POOR_PROMPT_WINDOW)
+
+        try:
+            self.records_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.records_path.open("a", encoding="utf8") as file:
+                file.write(record.model_dump_json() + "\n")
+            self.stats_path.write_text(
+                json.dumps(
+                    {k: v.model_dump() for k, v in stats.items()}, indent=2, ensure_ascii=False
+                ),
+                encoding="utf8",
+            )
+        except OSError as err:
+            logger.warning(f"Failed to write captcha telemetry - {err}")
+
+    def poor_prompts(
+        self,
+        min_samples: int | None = None,
+        max_success_rate: float | None = None,
+        reprobe_seconds: float | None = None,
+    ) -> List[str]:
+        """
+        近期提交次数足够且通过率过低的提示词
+
+        被跳过的提示词不会再产生新的判定，因此最后一次判定超过 reprobe_seconds 后重新放行，
+        由新的判定决定是否继续跳过
+        """
+        if min_samples is None:
+            min_samples = settings.CAPTCHA_POOR_PROMPT_MIN_SAMPLES
+        if max_success_rate is None:
+            max_success_rate = settings.CAPTCHA_POOR_PROMPT_MAX_SUCCESS_RATE
+        if reprobe_seconds is None:
+            reprobe_seconds = settings.CAPTCHA_POOR_PROMPT_REPROBE_SECONDS
+
+        now = time.time()
+        poor = []
+        for prompt, item in self.load_stats().items():
+            rate = item.success_rate
+            if (
+                prompt != "unknown"
+                and rate is not None
+                and len(item.recent) >= min_samples
+                and rate <= max_success_rate
+                and now - (item.last_checked_at or 0) < reprobe_seconds
+            ):
+                poor.append(prompt)
+        return poor
+
+
+captcha_store = CaptchaTelemetryStore()
+
+
+def adaptive_agent_config() -> EpicSettings:
+    """在 ignore_request_questions 中追加历史通过率过低的提示词，让 AgentV 尽早刷新挑战"""
+    if not settings.CAPTCHA_ADAPTIVE_IGNORE:
+        return settings
+
+    poor = [p for p in captcha_store.poor_prompts() if p not in settings.ignore_request_questions]
+    if not poor:
+        return settings
+
+    logger.debug(f"Skip poor captcha prompts - {poor}")
+    return settings.model_copy(
+        update={"ignore_request_questions": [*settings.ignore_request_questions, *poor]}
+    )
+
+
+class CaptchaSolver:
+    """
+    AgentV 的包装，记录每次人机挑战的题型、提示词、轮次、耗时与结果
+
+    Args:
+        page: 挂载挑战的页面
+        label: 挑战所在的流程，例如 login、checkout
+        email: 当前账号
+        agent: 预先创建的 AgentV，通常由 agent_factory 提供
+    """
+
+    def __init__(
+        self, page: Page, label: str, email: str | None = None, agent: AgentV | None = None
+    ):
+        self.page = page
+        self.label = label
+        self.email = email
+
+        self.agent = agent or AgentV(page=page, agent_config=adaptive_agent_config())
+
+        # 点击触发挑战时 getcaptcha 可能早于 wait_for_challenge 返回，因此从创建时开始监听
+        self._rounds: List[ChallengeRound] = []
+        if settings.CAPTCHA_TELEMETRY_ENABLED:
+            page.on("response", self._on_response)
+
+    def _fill_from_agent(self, challenge: ChallengeRound):
+        # getcaptcha 响应通常经过 hsw 加密，由 AgentV 解密后保存在 _captcha_payload 中，
+        # 该属性属于内部实现，新版本中不存在时跳过，题型与提示词回退到明文响应中的值
+        payload = getattr(self.agent, "_captcha_payload", None)
+        if not payload or challenge.prompt != "unknown":
+            return
+        with suppress(Exception):
+            challenge.prompt = payload.get_requester_question().strip() or "unknown"
+            request_type = getattr(payload.request_type, "value", payload.request_type)
+            challenge.request_type = str(request_type or "unknown")
+
+    async def _on_response(self, r: Response):
+        if URL_GETCAPTCHA in r.url:
+            data = {}
+            if r.headers.get("content-type", "") == "application/json":
+                with suppress(Exception):
+                    data = await r.json()
+            # 无感验证直接通过，没有出现挑战
+            if data.get("pass"):
+                return
+
+            challenge = ChallengeRound()
+            self._rounds.append(challenge)
+            if data.get("request_config"):
+                challenge.request_type = data.get("request_type") or "unknown"
+                question = data.get("requester_question") or {}
+                challenge.prompt = (question.get("en") or "unknown").strip()
+        elif URL_CHECKCAPTCHA in r.url and self._rounds:
+            self._fill_from_agent(self._rounds[-1])
+            with suppress(Exception):
+                self._rounds[-1].passed = bool((await r.json()).get("pass"))
+
+    async def wait_for_challenge(self):
+        started_at = time.time()
+        start = time.perf_counter()
+        signal = "error"
+        try:
+            result = await self.agent.wait_for_challenge()
+            signal = str(getattr(result, "value", result))
+            return result
+        except asyncio.CancelledError:
+            signal = "cancelled"
+            raise
+        finally:
+            self._record(started_at, round(time.perf_counter() - start, 3), signal)
+
+    def _record(self, started_at: float, latency: float, signal: str):
+        if self._rounds:
+            self._fill_from_agent(self._rounds[-1])
+        rounds, self._rounds = self._rounds, []
+        # 被取消且未出现挑战，说明页面无需验证直接通过
+        if signal == "cancelled" and not rounds:
+            return
+
+        success = any(r.passed for r in rounds) or signal.lower().endswith("success")
+        record_captcha(success, latency)
+        if not settings.CAPTCHA_TELEMETRY_ENABLED:
+            return
+
+        record = ChallengeRecord(
+            label=self.label,
+            email=self.email,
+            started_at=started_at,
+            latency=latency,
+            signal=signal,
+            success=success,
+            rounds=rounds,
+        )
+        captcha_store.add(record)
+        logger.bind(captcha=record.model_dump()).debug(
+            f"Challenge recorded - label={self.label} {signal=} {success=} "
+            f"rounds={len(rounds)} {latency=}s"
+        )
+
+    def close(self):
+        # AgentV 在创建时向页面注册了自己的 response 监听器，同一页面多次创建时会不断累积
+        for handler in (self._on_response, getattr(self.agent, "_task_handler", None)):
+            with suppress(Exception):
+                self.page.remove_listener("response", handler)
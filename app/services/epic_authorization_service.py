@@ -10,65 +10,132 @@ import json
 import time
 from contextlib import suppress
 
-from hcaptcha_challenger.agent import AgentV
 from loguru import logger
-from playwright.async_api import expect, Page, Response
+from playwright.async_api import Page, Response
 
-from settings import SCREENSHOTS_DIR, settings
+from profiler import phase, profile_phase
+from services.agent_factory_service import agent_factory
+from services.session_probe_service import session_probe
+from settings import SCREENSHOTS_DIR, EpicAccount, settings
+from utils import timed_wait
 
 URL_CLAIM = "https://store.epicgames.com/en-US/free-games"
 
 
 class EpicAuthorization:
 
-    def __init__(self, page: Page):
+    def __init__(self, page: Page, account: EpicAccount | None = None):
         self.page = page
+        self.account = account or settings.accounts[0]
 
         self._is_login_success_signal = asyncio.Queue()
         self._is_refresh_csrf_signal = asyncio.Queue()
 
+    def _match_response(self, r: Response):
+        """仅返回需要读取响应体的回调，避免把每个 POST 响应体都拉过协议通道"""
+        if r.request.method != "POST":
+            return None
+        for pattern, handler in (
+            ("/id/api/login", self._on_login_response),
+            ("/id/api/analytics", self._on_analytics_response),
+            ("/account/v2/refresh-csrf", self._on_refresh_csrf_response),
+        ):
+            if pattern in r.url:
+                return handler
+        return None
+
     async def _on_response_anything(self, r: Response):
-        if r.request.method != "POST" or "talon" in r.url:
+        if not (handler := self._match_response(r)):
             return
 
         with suppress(Exception):
-            result = await r.json()
-            result_json = json.dumps(result, indent=2, ensure_ascii=False)
-
-            if "/id/api/login" in r.url and result.get("errorCode"):
-                logger.error(f"{r.request.method} {r.url} - {result_json}")
-            elif "/id/api/analytics" in r.url and result.get("accountId"):
-                self._is_login_success_signal.put_nowait(result)
-            elif "/account/v2/refresh-csrf" in r.url and result.get("success", False) is True:
-                self._is_refresh_csrf_signal.put_nowait(result)
-            # else:
-            #     logger.debug(f"{r.request.method} {r.url} - {result_json}")
-
-    async def _handle_right_account_validation(self):
+            handler(r, await r.json())
+
+    @staticmethod
+    def _on_login_response(r: Response, result: dict):
+        if result.get("errorCode"):
+            logger.error(f"{r.request.method} {r.url} - {json.dumps(result, ensure_ascii=False)}")
+
+    def _on_analytics_response(self, _: Response, result: dict):
+        if result.get("accountId"):
+            self._is_login_success_signal.put_nowait(result)
+
+    def _on_refresh_csrf_response(self, _: Response, result: dict):
+        if result.get("success", False) is True:
+            self._is_refresh_csrf_signal.put_nowait(result)
+
+    async def _handle_right_account_validation(self, timeout: float = 60, max_rounds: int = 10):
         """
         以下验证仅会在登录成功后出现
-        Returns:
 
+        Args:
+            timeout: 整个验证流程的时限（秒）
+            max_rounds: 等待提醒按钮或 CSRF 刷新信号的最大轮数
+
+        Raises:
+            TimeoutError: 时限或轮数耗尽后仍未完成验证
         """
         await self.page.goto("https://www.epicgames.com/account/personal", wait_until="networkidle")
 
         btn_ids = ["#link-success", "#login-reminder-prompt-setup-tfa-skip", "#yes"]
 
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
         # == 账号长期不登录需要做的额外验证 == #
 
-        while self._is_refresh_csrf_signal.empty() and btn_ids:
-            await self.page.wait_for_timeout(500)
-            action_chains = btn_ids.copy()
-            for action in action_chains:
-                with suppress(Exception):
-                    reminder_btn = self.page.locator(action)
-                    await expect(reminder_btn).to_be_visible(timeout=1000)
-                    await reminder_btn.click(timeout=1000)
-                    btn_ids.remove(action)
+        async with timed_wait("right_account_validation"):
+            for _ in range(max_rounds):
+                if not self._is_refresh_csrf_signal.empty() or not btn_ids:
+                    return
+                if (remaining := deadline - loop.time()) <= 0:
+                    break
+
+                # 等待任一提醒按钮出现，或 CSRF 刷新信号到达
+                reminder = self.page.locator(", ".join(btn_ids)).first
+                btn_visible = asyncio.create_task(
+                    reminder.wait_for(state="visible", timeout=remaining * 1000)
+                )
+                # 按钮等待超时后的异常不会再被读取，在回调中消费掉
+                btn_visible.add_done_callback(lambda t: t.cancelled() or t.exception())
+                csrf_refreshed = asyncio.create_task(self._is_refresh_csrf_signal.get())
+                try:
+                    done, _ = await asyncio.wait(
+                        {btn_visible, csrf_refreshed},
+                        timeout=remaining,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                finally:
+                    btn_visible.cancel()
+                    csrf_refreshed.cancel()
+
+                if csrf_refreshed in done and not csrf_refreshed.cancelled():
+                    self._is_refresh_csrf_signal.put_nowait(csrf_refreshed.result())
+                    return
+
+                clicked = False
+                for action in btn_ids.copy():
+                    with suppress(Exception):
+                        reminder_btn = self.page.locator(action)
+                        if await reminder_btn.is_visible():
+                            await reminder_btn.click(timeout=1000)
+                            btn_ids.remove(action)
+                            clicked = True
+
+                # 按钮可见但暂不可点击时，等待其重新渲染，避免空转
+                if not clicked:
+                    with suppress(Exception):
+                        await reminder.wait_for(state="detached", timeout=1000)
+
+            if not self._is_refresh_csrf_signal.empty() or not btn_ids:
+                return
+
+        raise TimeoutError(f"Right account validation unfinished - {timeout=}s {max_rounds=}")
 
+    @profile_phase("login")
     async def _login(self) -> bool | None:
         # 尽可能早地初始化机器人
-        agent = AgentV(page=self.page, agent_config=settings)
+        agent = agent_factory.solver(self.page, label="login", email=self.account.email)
 
         # {{< SIGN IN PAGE >}}
         logger.debug("Login with Email")
@@ -80,7 +147,7 @@ class EpicAuthorization:
             # 1. 使用电子邮件地址登录
             email_input = self.page.locator("#email")
             await email_input.clear()
-            await email_input.type(settings.EPIC_EMAIL)
+            await email_input.type(self.account.email)
 
             # 2. 点击继续按钮
             await self.page.click("#continue")
@@ -88,20 +155,21 @@ class EpicAuthorization:
             # 3. 输入密码
             password_input = self.page.locator("#password")
             await password_input.clear()
-            await password_input.type(settings.EPIC_PASSWORD.get_secret_value())
+            await password_input.type(self.account.password.get_secret_value())
 
             # 4. 点击登录按钮，触发人机挑战值守监听器
             # Active hCaptcha checkbox
             await self.page.click("#sign-in")
 
             # Active hCaptcha challenge
-            await agent.wait_for_challenge()
+            async with phase("wait_for_challenge"):
+                await agent.wait_for_challenge()
 
             # Wait for the page to redirect
             await asyncio.wait_for(self._is_login_success_signal.get(), timeout=60)
             logger.success("Login success")
 
-            await asyncio.wait_for(self._handle_right_account_validation(), timeout=60)
+            await self._handle_right_account_validation()
             logger.success("Right account validation success")
             return True
         except Exception as err:
@@ -110,16 +178,29 @@ class EpicAuthorization:
             sr.mkdir(parents=True, exist_ok=True)
             await self.page.screenshot(path=sr.joinpath(f"login-{int(time.time())}.png"))
             return None
+        finally:
+            agent.close()
 
-    async def invoke(self):
+    @profile_phase("authorization")
+    async def invoke(self) -> bool:
         self.page.on("response", self._on_response_anything)
+        try:
+            return await self._invoke()
+        finally:
+            # 登录流程结束后不再需要监听，避免后续领取流程的每个响应都经过回调
+            self.page.remove_listener("response", self._on_response_anything)
 
-        for _ in range(3):
-            await self.page.goto(URL_CLAIM, wait_until="domcontentloaded")
+    async def _invoke(self) -> bool:
+        context = self.page.context
 
-            if "true" == await self.page.locator("//egs-navigation").get_attribute("isloggedin"):
+        for i in range(3):
+            # 首次检查允许使用缓存，登录失败后的重试必须重新探测
+            if await session_probe.is_valid(context, self.account, force=i > 0):
                 logger.success("Epic Games is already logged in")
                 return True
 
             if await self._login():
-                return
+                await session_probe.remember(context, self.account)
+                return True
+
+        return False
@@ -4,21 +4,33 @@
 # GitHub     : https://github.com/QIN2DIM
 # Description: 游戏商城控制句柄
 
+import asyncio
 import json
-from contextlib import suppress
+import time
+from contextlib import asynccontextmanager, suppress
+from enum import Enum
 from json import JSONDecodeError
-from typing import List
+from pathlib import Path
+from typing import AsyncIterator, List, Set
 
 import httpx
-from hcaptcha_challenger.agent import AgentV
 from loguru import logger
-from playwright.async_api import Page
+from playwright.async_api import BrowserContext, Page
 from playwright.async_api import expect, TimeoutError, FrameLocator
 from tenacity import retry, retry_if_exception_type, stop_after_attempt
 
-from models import OrderItem, Order
-from models import PromotionGame
-from settings import settings, RUNTIME_DIR
+from extensions.ext_httpx import http_client_lifespan, request_with_retry
+from extensions.ext_metrics import record_claims
+from models import OrderItem, OrderHistory
+from models import PromotionGame, PromotionWindow
+from profiler import phase, profile_phase
+from services.agent_factory_service import agent_factory
+from services.captcha_telemetry_service import CaptchaSolver
+from services.ownership_index_service import OwnershipIndex
+from services.resource_router_service import ResourceRouter
+from services.session_probe_service import is_auth_failure, session_probe
+from settings import settings, EpicAccount, RUNTIME_DIR
+from utils import LoopLocal, timed_wait
 
 URL_CLAIM = "https://store.epicgames.com/en-US/free-games"
 URL_LOGIN = (
@@ -28,42 +40,58 @@ URL_CART = "https://store.epicgames.com/en-US/cart"
 URL_CART_SUCCESS = "https://store.epicgames.com/en-US/cart/success"
 
 
+# 购物车中的商品卡片
+CART_CARD_SELECTOR = "div[data-testid='offer-card-layout-wrapper']"
+
+# 一次性读取购物车状态并将所有付费商品移入愿望单，返回被移除商品的标题
+JS_MOVE_PAID_CARDS_TO_WISHLIST = """
+(selector) => {
+    const hasText = (el, tag, text) =>
+        [...el.querySelectorAll(tag)].some((e) => e.textContent.trim() === text);
+    const removed = [];
+    for (const card of document.querySelectorAll(selector)) {
+        if (hasText(card, "span", "Free")) continue;
+        const btn = [...card.querySelectorAll("button")].find((b) =>
+            hasText(b, "span", "Move to wishlist")
+        );
+        if (!btn) continue;
+        const title = card.querySelector("[data-testid='offer-title-info-title']");
+        removed.push((title ? title.textContent : card.innerText.split("\\n")[0]).trim());
+        btn.click();
+    }
+    return removed;
+}
+"""
+
+# 购物车重新渲染完成：仅剩免费商品
+JS_CART_ONLY_FREE = """
+(selector) => [...document.querySelectorAll(selector)].every((card) =>
+    [...card.querySelectorAll("span")].some((e) => e.textContent.trim() === "Free")
+)
+"""
+
+URL_ORDER_HISTORY = "https://www.epicgames.com/account/v2/payment/ajaxGetOrderHistory"
+
+# 订单历史分页上限，防止异常的 nextPageToken 导致无限翻页
+ORDER_HISTORY_MAX_PAGES = 100
+
 URL_PROMOTIONS = "https://store-site-backend-static.ak.epicgames.com/freeGamesPromotions"
 URL_PRODUCT_PAGE = "https://store.epicgames.com/en-US/p/"
 URL_PRODUCT_BUNDLES = "https://store.epicgames.com/en-US/bundles/"
 
 
-def get_promotions() -> List[PromotionGame]:
-    """
-    获取周免游戏数据
-
-    <即将推出> promotion["promotions"]["upcomingPromotionalOffers"]
-    <本周免费> promotion["promotions"]["promotionalOffers"]
-    :return: {"pageLink1": "pageTitle1", "pageLink2": "pageTitle2", ...}
-    """
+def is_discount_game(prot: dict) -> bool | None:
+    with suppress(KeyError, IndexError, TypeError):
+        offers = prot["promotions"]["promotionalOffers"][0]["promotionalOffers"]
+        for i, offer in enumerate(offers):
+            if offer["discountSetting"]["discountPercentage"] == 0:
+                return True
 
-    def is_discount_game(prot: dict) -> bool | None:
-        with suppress(KeyError, IndexError, TypeError):
-            offers = prot["promotions"]["promotionalOffers"][0]["promotionalOffers"]
-            for i, offer in enumerate(offers):
-                if offer["discountSetting"]["discountPercentage"] == 0:
-                    return True
 
+def parse_promotions(data: dict) -> List[PromotionGame]:
+    """从 freeGamesPromotions 响应中解析出本周免费的游戏"""
     promotions: List[PromotionGame] = []
 
-    resp = httpx.get(URL_PROMOTIONS, params={"local": "zh-CN"})
-
-    try:
-        data = resp.json()
-    except JSONDecodeError as err:
-        logger.error("Failed to get promotions", err=err)
-        return []
-
-    with suppress(Exception):
-        cache_key = RUNTIME_DIR.joinpath("promotions.json")
-        cache_key.parent.mkdir(parents=True, exist_ok=True)
-        cache_key.write_text(json.dumps(data, indent=2, ensure_ascii=False))
-
     # Get store promotion data and <this week free> games
     for e in data["data"]["Catalog"]["searchStore"]["elements"]:
 
@@ -88,64 +116,276 @@ def get_promotions() -> List[PromotionGame]:
     return promotions
 
 
+def parse_promotion_windows(data: dict) -> List[PromotionWindow]:
+    """从 freeGamesPromotions 响应中解析出本周与即将推出的免费窗口"""
+    windows: List[PromotionWindow] = []
+
+    for e in data["data"]["Catalog"]["searchStore"]["elements"]:
+        promotions = e.get("promotions") or {}
+        for key, upcoming in (("promotionalOffers", False), ("upcomingPromotionalOffers", True)):
+            for group in promotions.get(key) or []:
+                for offer in group.get("promotionalOffers") or []:
+                    with suppress(KeyError, TypeError, ValueError):
+                        if offer["discountSetting"]["discountPercentage"] != 0:
+                            continue
+                        windows.append(
+                            PromotionWindow(
+                                title=e["title"],
+                                id=e["id"],
+                                namespace=e["namespace"],
+                                startDate=offer["startDate"],
+                                endDate=offer["endDate"],
+                                upcoming=upcoming,
+                            )
+                        )
+
+    return windows
+
+
+class PromotionsCache:
+    """
+    freeGamesPromotions 的缓存层
+
+    - 进程内：解析后的 PromotionGame 列表在 TTL 内被所有账号共享
+    - 磁盘：RUNTIME_DIR/promotions.json 及其 ETag/Last-Modified 元数据
+    - 网络：TTL 过期后发送条件请求，304 时直接复用磁盘副本
+    """
+
+    def __init__(self, cache_dir: Path = RUNTIME_DIR, ttl: int | None = None):
+        self.data_path = cache_dir.joinpath("promotions.json")
+        self.meta_path = cache_dir.joinpath("promotions.meta.json")
+        self.ttl = settings.PROMOTIONS_CACHE_TTL_SECONDS if ttl is None else ttl
+
+        self._promotions: List[PromotionGame] | None = None
+        self._windows: List[PromotionWindow] = []
+        self._fetched_at: float = 0
+
+        self._lock = LoopLocal(asyncio.Lock)
+
+    def _is_fresh(self, fetched_at: float) -> bool:
+        return self.ttl > 0 and time.time() - fetched_at < self.ttl
+
+    def _load_meta(self) -> dict:
+        with suppress(Exception):
+            return json.loads(self.meta_path.read_text(encoding="utf8"))
+        return {}
+
+    def _load_data(self) -> dict | None:
+        with suppress(Exception):
+            return json.loads(self.data_path.read_text(encoding="utf8"))
+        return None
+
+    def _dump(self, meta: dict, data: dict | None = None):
+        with suppress(Exception):
+            self.data_path.parent.mkdir(parents=True, exist_ok=True)
+            if data is not None:
+                self.data_path.write_text(
+                    json.dumps(data, indent=2, ensure_ascii=False), encoding="utf8"
+                )
+            self.meta_path.write_text(json.dumps(meta, indent=2), encoding="utf8")
+
+    def _remember(self, data: dict, fetched_at: float) -> List[PromotionGame]:
+        self._promotions = parse_promotions(data)
+        with suppress(Exception):
+            self._windows = parse_promotion_windows(data)
+        self._fetched_at = fetched_at
+        return self._promotions.copy()
+
+    def invalidate(self):
+        self._promotions = None
+        self._windows = []
+        self._fetched_at = 0
+
+    async def windows(self, client: httpx.AsyncClient | None = None) -> List[PromotionWindow]:
+        await self.get(client)
+        return self._windows.copy()
+
+    async def get(self, client: httpx.AsyncClient | None = None) -> List[PromotionGame]:
+        # 并发的账号只触发一次请求，其余账号等待并复用进程内缓存
+        async with self._lock.get():
+            return await self._get(client)
+
+    @staticmethod
+    async def _fetch(client: httpx.AsyncClient | None, headers: dict) -> httpx.Response:
+        if client is not None:
+            return await request_with_retry(
+                client, "GET", URL_PROMOTIONS, params={"local": "zh-CN"}, headers=headers
+            )
+        async with http_client_lifespan() as client:
+            return await PromotionsCache._fetch(client, headers)
+
+    async def _get(self, client: httpx.AsyncClient | None) -> List[PromotionGame]:
+        # == 进程内缓存 == #
+        if self._promotions is not None and self._is_fresh(self._fetched_at):
+            return self._promotions.copy()
+
+        # == 磁盘缓存 == #
+        meta = self._load_meta()
+        cached_data = self._load_data()
+        if cached_data is not None and self._is_fresh(meta.get("fetched_at", 0)):
+            logger.debug("Load promotions from disk cache")
+            return self._remember(cached_data, meta["fetched_at"])
+
+        # == 条件请求 == #
+        headers = {}
+        if cached_data is not None:
+            if etag := meta.get("etag"):
+                headers["If-None-Match"] = etag
+            if last_modified := meta.get("last_modified"):
+                headers["If-Modified-Since"] = last_modified
+
+        try:
+            resp = await self._fetch(client, headers)
+        except httpx.HTTPError as err:
+            logger.error("Failed to get promotions", err=err)
+            return self._remember(cached_data, self._fetched_at) if cached_data else []
+
+        now = time.time()
+
+        if resp.status_code == 304 and cached_data is not None:
+            logger.debug("Promotions not modified, reuse disk cache")
+            meta["fetched_at"] = now
+            self._dump(meta)
+            return self._remember(cached_data, now)
+
+        # 错误响应不能覆盖磁盘缓存，回退到最后一次成功的数据
+        if not resp.is_success:
+            logger.error(f"Failed to get promotions - status={resp.status_code}")
+            return self._remember(cached_data, self._fetched_at) if cached_data else []
+
+        try:
+            data = resp.json()
+            promotions = self._remember(data, now)
+        except (JSONDecodeError, KeyError, TypeError) as err:
+            logger.error("Failed to get promotions", err=err)
+            return self._remember(cached_data, self._fetched_at) if cached_data else []
+
+        meta = {
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": now,
+        }
+        self._dump(meta, data)
+
+        return promotions
+
+
+promotions_cache = PromotionsCache()
+
+
+@profile_phase("get_promotions")
+async def get_promotions(client: httpx.AsyncClient | None = None) -> List[PromotionGame]:
+    """
+    获取周免游戏数据
+
+    <即将推出> promotion["promotions"]["upcomingPromotionalOffers"]
+    <本周免费> promotion["promotions"]["promotionalOffers"]
+    :return: {"pageLink1": "pageTitle1", "pageLink2": "pageTitle2", ...}
+    """
+    return await promotions_cache.get(client)
+
+
+async def get_promotion_windows(client: httpx.AsyncClient | None = None) -> List[PromotionWindow]:
+    """获取当前与即将推出的免费窗口，与 get_promotions 共享同一份缓存"""
+    return await promotions_cache.windows(client)
+
+
 class EpicAgent:
 
-    def __init__(self, page: Page):
+    def __init__(
+        self,
+        page: Page,
+        client: httpx.AsyncClient | None = None,
+        account: EpicAccount | None = None,
+    ):
         self.page = page
+        self.client = client
+        self.account = account or settings.accounts[0]
+        self.ownership = OwnershipIndex(self.account.email)
 
-        self.epic_games = EpicGames(self.page)
+        self.epic_games = EpicGames(self.page, account=self.account)
 
         self._promotions: List[PromotionGame] = []
         self._ctx_cookies_is_available: bool = False
         self._orders: List[OrderItem] = []
-        self._namespaces: List[str] = []
+        self._namespaces: Set[str] = set()
 
         self._cookies = None
 
+    async def _fetch_order_history_page(self, next_page_token: str | None) -> OrderHistory:
+        # 会话探测刚刚请求过第一页，直接复用
+        if not next_page_token and (data := session_probe.pop_probe_page(self.account)):
+            return OrderHistory(**data)
+
+        params = {"locale": "en-US", "sortDir": "DESC", "sortBy": "DATE"}
+        if next_page_token:
+            params["nextPageToken"] = next_page_token
+
+        # 复用浏览器上下文的会话 Cookie，无需页面导航
+        resp = await self.page.context.request.get(
+            URL_ORDER_HISTORY, params=params, max_redirects=0
+        )
+        if is_auth_failure(resp.status):
+            # 缓存的探测结果已失效，下一次运行必须重新登录
+            session_probe.invalidate(self.account)
+            self._ctx_cookies_is_available = False
+            raise ValueError(f"Session rejected by order history - status={resp.status}")
+        if not resp.ok:
+            raise ValueError(f"Failed to fetch order history - status={resp.status}")
+        return OrderHistory(**await resp.json())
+
     async def _sync_order_history(self):
-        """获取最近的订单纪录"""
+        """获取全部的订单纪录"""
         if self._orders:
             return
 
         completed_orders: List[OrderItem] = []
 
         try:
-            await self.page.goto("https://www.epicgames.com/account/v2/payment/ajaxGetOrderHistory")
-            text_content = await self.page.text_content("//pre")
-            data = json.loads(text_content)
-            for _order in data["orders"]:
-                order = Order(**_order)
-                if order.orderType != "PURCHASE":
-                    continue
-                for item in order.items:
-                    if not item.namespace or len(item.namespace) != 32:
+            next_page_token = None
+            for _ in range(ORDER_HISTORY_MAX_PAGES):
+                history = await self._fetch_order_history_page(next_page_token)
+                for order in history.orders:
+                    if order.orderType != "PURCHASE":
                         continue
-                    completed_orders.append(item)
+                    for item in order.items:
+                        if not item.namespace or len(item.namespace) != 32:
+                            continue
+                        completed_orders.append(item)
+
+                if not history.orders or not history.nextPageToken:
+                    break
+                if history.nextPageToken == next_page_token:
+                    break
+                next_page_token = history.nextPageToken
         except Exception as err:
             logger.warning(err)
 
         self._orders = completed_orders
 
+        with suppress(Exception):
+            self.ownership.add_orders(completed_orders)
+
+    @profile_phase("check_orders")
     async def _check_orders(self):
-        # 获取玩家历史交易订单
-        # 运行该操作之前必须确保账号信息有效
-        await self._sync_order_history()
+        # 获取玩家历史交易订单，运行该操作之前必须确保账号信息有效
+        # 同时获取本周促销数据
+        _, promotions = await asyncio.gather(
+            self._sync_order_history(), get_promotions(self.client)
+        )
 
-        self._namespaces = self._namespaces or [order.namespace for order in self._orders]
+        self._namespaces = self._namespaces or {order.namespace for order in self._orders}
 
-        # 获取本周促销数据
         # 正交数据，得到还未收集的优惠商品
-        self._promotions = [p for p in get_promotions() if p.namespace not in self._namespaces]
+        promotions = [p for p in promotions if p.namespace not in self._namespaces]
+        self._promotions = self.ownership.missing(promotions)
 
     async def _should_ignore_task(self) -> bool:
         self._ctx_cookies_is_available = False
 
-        # 判断浏览器是否已缓存账号令牌信息
-        await self.page.goto(URL_CLAIM, wait_until="domcontentloaded")
-
+        # 判断浏览器是否已缓存账号令牌信息，与授权流程共享探测结果
         # == 令牌过期 == #
-        status = await self.page.locator("//egs-navigation").get_attribute("isloggedin")
-        if status == "false":
+        if not await session_probe.is_valid(self.page.context, self.account):
             logger.error("❌ context cookies is not available")
             return False
 
@@ -157,6 +397,10 @@ class EpicAgent:
         # 加载正交的优惠商品数据
         await self._check_orders()
 
+        # 缓存的探测结果已过期，订单接口拒绝了会话
+        if not self._ctx_cookies_is_available:
+            return False
+
         # 促销列表为空，说明免费游戏都已收集，任务结束
         if not self._promotions:
             return True
@@ -164,14 +408,17 @@ class EpicAgent:
         # 账号信息有效，但还存在没有领完的游戏
         return False
 
-    async def collect_epic_games(self):
+    async def collect_epic_games(self) -> bool:
+        """
+        Returns: 工作流是否正常结束（无待领取的游戏也视为正常结束）
+        """
         if await self._should_ignore_task():
             logger.success("All week-free games are already in the library")
-            return
+            return True
 
         # 刷新浏览器身份信息
         if not self._ctx_cookies_is_available:
-            return
+            return False
 
         # 加载正交的优惠商品数据
         if not self._promotions:
@@ -179,8 +426,9 @@ class EpicAgent:
 
         if not self._promotions:
             logger.success("All week-free games are already in the library")
-            return
+            return True
 
+        is_success = True
         game_promotions = []
         bundle_promotions = []
         for p in self._promotions:
@@ -194,24 +442,242 @@ class EpicAgent:
         # 收集优惠游戏
         if game_promotions:
             try:
-                await self.epic_games.collect_weekly_games(game_promotions)
+                result = await self.epic_games.collect_weekly_games(game_promotions)
+                if result:
+                    # 跳过或未能加入购物车的商品没有被领取，不能写入拥有索引
+                    claimed = set(self.epic_games.claimed_urls)
+                    claimed_promotions = [p for p in game_promotions if p.url in claimed]
+                    self.ownership.add_promotions(claimed_promotions)
+                    record_claims(self.account.email, len(claimed_promotions))
+                is_success = result is not False
             except Exception as e:
                 logger.exception(e)
+                is_success = False
+
+        # 结账失败可能源于会话失效，下一次运行重新探测而不是信任缓存
+        if not is_success:
+            session_probe.invalidate(self.account)
 
         # 收集游戏捆绑内容
         if bundle_promotions:
             logger.debug("Skip the game bundled content")
 
         logger.debug("All tasks in the workflow have been completed")
+        return is_success
+
+
+class CheckoutState(str, Enum):
+    CART = "cart"
+    LICENSE = "license"
+    PURCHASE_IFRAME = "purchase_iframe"
+    CONFIRM = "confirm"
+    CAPTCHA = "captcha"
+    SUCCESS = "success"
+
+
+# 各状态的超时时间（秒），人机挑战包含模型推理，需要更宽裕的时间
+CHECKOUT_STATE_TIMEOUTS = {
+    CheckoutState.CART: 60,
+    CheckoutState.LICENSE: 15,
+    CheckoutState.PURCHASE_IFRAME: 30,
+    CheckoutState.CONFIRM: 15,
+    CheckoutState.CAPTCHA: 90,
+}
+
+
+def checkout_budget(max_retries: int | None = None, backoff_seconds: float | None = None) -> float:
+    """
+    结账流程的最坏耗时：整个流程执行 max_retries + 1 次且每次都在最后一个状态超时，再加上退避
+
+    purchase_free_game 阶段的默认时限，保证 CHECKOUT_MAX_RETRIES 不会被阶段时限提前截断
+    """
+    max_retries = settings.CHECKOUT_MAX_RETRIES if max_retries is None else max_retries
+    if backoff_seconds is None:
+        backoff_seconds = settings.CHECKOUT_BACKOFF_SECONDS
+
+    attempts = max(0, max_retries) + 1
+    backoff = sum(backoff_seconds * 2**i for i in range(attempts - 1))
+    return sum(CHECKOUT_STATE_TIMEOUTS.values()) * attempts + backoff
+
+
+class CheckoutStateMachine:
+    """
+    cart → license → purchase iframe → confirm → captcha → success
+
+    - 每个状态独立超时
+    - 失败后退避重试，并从失败的状态恢复，而不是从购物车重新开始
+    - 结账 iframe 已消失时无法原地恢复，回退到购物车状态
+    - 所有状态共享重试次数，耗尽后结束流程
+    """
+
+    def __init__(
+        self,
+        epic_games: "EpicGames",
+        max_retries: int | None = None,
+        backoff_seconds: float | None = None,
+    ):
+        self.epic_games = epic_games
+        self.page = epic_games.page
+        self.max_retries = settings.CHECKOUT_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_seconds = (
+            settings.CHECKOUT_BACKOFF_SECONDS if backoff_seconds is None else backoff_seconds
+        )
+
+        self.state = CheckoutState.CART
+        self.transitions: List[dict] = []
+
+        self._agent: CaptchaSolver | None = None
+        self._wpc: FrameLocator | None = None
+        self._failures = 0
+
+    async def _on_cart(self) -> CheckoutState:
+        await self.page.goto(URL_CART, wait_until="domcontentloaded")
+
+        logger.debug("Move ALL paid games from the shopping cart out")
+        await self.epic_games._empty_cart(self.page)
+
+        # {{< Insert hCaptcha Challenger >}}
+        if self._agent:
+            self._agent.close()
+        email = self.epic_games.account.email if self.epic_games.account else None
+        self._agent = agent_factory.solver(self.page, label="checkout", email=email)
+
+        # --> Check out cart
+        await self.page.click("//button//span[text()='Check Out']")
+        return CheckoutState.LICENSE
+
+    async def _on_license(self) -> CheckoutState:
+        # <-- Handle Any LICENSE
+        await self.epic_games._agree_license(self.page)
+        return CheckoutState.PURCHASE_IFRAME
+
+    async def _on_purchase_iframe(self) -> CheckoutState:
+        # --> Move to webPurchaseContainer iframe
+        self._wpc, _ = await self.epic_games._active_purchase_container(self.page)
+        logger.debug("Click payment button")
+        return CheckoutState.CONFIRM
+
+    async def _on_confirm(self) -> CheckoutState:
+        # <-- Handle UK confirm-order
+        await self.epic_games._uk_confirm_order(self._wpc)
+        return CheckoutState.CAPTCHA
+
+    async def _on_captcha(self) -> CheckoutState:
+        # 没有触发人机挑战时订单会直接跳转至成功页
+        async def _solve():
+            async with phase("wait_for_challenge"):
+                return await self._agent.wait_for_challenge()
+
+        # 不使用 Playwright 默认的 30s 超时，截止时间由外层的状态超时统一控制
+        challenge = asyncio.create_task(_solve())
+        success = asyncio.create_task(self.page.wait_for_url(URL_CART_SUCCESS, timeout=0))
+        try:
+            done, _ = await asyncio.wait({challenge, success}, return_when=asyncio.FIRST_COMPLETED)
+            if success in done:
+                success.result()
+                return CheckoutState.SUCCESS
+            # 挑战结束后订单应很快跳转，否则视为本次挑战失败
+            challenge.result()
+            await asyncio.wait_for(success, timeout=30)
+        finally:
+            challenge.cancel()
+            success.cancel()
+        return CheckoutState.SUCCESS
+
+    async def _resume_state(self, failed: CheckoutState) -> CheckoutState:
+        if failed in (CheckoutState.CART, CheckoutState.LICENSE, CheckoutState.PURCHASE_IFRAME):
+            return failed
+
+        # 确认订单与人机挑战都依赖结账 iframe，iframe 消失时只能从购物车重新开始
+        with suppress(Exception):
+            if await self.page.locator("//iframe[@class='']").count():
+                # 重新点击下单按钮才能再次触发人机挑战
+                if failed == CheckoutState.CAPTCHA:
+                    return CheckoutState.PURCHASE_IFRAME
+                return failed
+        return CheckoutState.CART
+
+    async def run(self) -> bool:
+        try:
+            return await self._run()
+        finally:
+            if self._agent:
+                self._agent.close()
+
+    async def _run(self) -> bool:
+        handlers = {
+            CheckoutState.CART: self._on_cart,
+            CheckoutState.LICENSE: self._on_license,
+            CheckoutState.PURCHASE_IFRAME: self._on_purchase_iframe,
+            CheckoutState.CONFIRM: self._on_confirm,
+            CheckoutState.CAPTCHA: self._on_captcha,
+        }
+
+        self.state = CheckoutState.CART
+        while self.state != CheckoutState.SUCCESS:
+            state = self.state
+            start = time.perf_counter()
+            try:
+                async with phase(f"checkout_{state.value}"):
+                    next_state = await asyncio.wait_for(
+                        handlers[state](), timeout=CHECKOUT_STATE_TIMEOUTS[state]
+                    )
+            except Exception as err:
+                elapsed = round(time.perf_counter() - start, 3)
+                self._failures = failures = self._failures + 1
+                self._record(state, None, elapsed, error=repr(err))
+                logger.warning(f"Checkout state failed - {state.value} {failures=} {err=}")
+
+                # 从失败的状态恢复后可能重放之前的状态，按状态计数会让最坏耗时成倍增长
+                if failures > self.max_retries:
+                    logger.error(
+                        f"Checkout aborted after {failures} failures, last in {state.value}"
+                    )
+                    return False
+
+                await asyncio.sleep(self.backoff_seconds * 2 ** (failures - 1))
+                self.state = await self._resume_state(state)
+                if self.state == CheckoutState.CART:
+                    with suppress(Exception):
+                        await self.page.reload()
+                continue
+
+            elapsed = round(time.perf_counter() - start, 3)
+            self._record(state, next_state, elapsed)
+            self.state = next_state
+
+        return True
+
+    def _record(
+        self,
+        state: CheckoutState,
+        next_state: CheckoutState | None,
+        elapsed: float,
+        error: str | None = None,
+    ):
+        transition = {
+            "state": state.value,
+            "next": next_state.value if next_state else None,
+            "elapsed": elapsed,
+            "error": error,
+        }
+        self.transitions.append(transition)
+        logger.bind(checkout=transition).debug(
+            f"Checkout transition - {state.value} -> {transition['next']} {elapsed=}s"
+        )
 
 
 class EpicGames:
 
-    def __init__(self, page: Page):
+    def __init__(self, page: Page, account: EpicAccount | None = None):
         self.page = page
+        self.account = account
 
         self._promotions: List[PromotionGame] = []
 
+        # 最近一次 collect_weekly_games 中加入购物车并成功结账的商品链接
+        self.claimed_urls: List[str] = []
+
     @staticmethod
     async def _agree_license(page: Page):
         logger.debug("Agree license")
@@ -227,9 +693,10 @@ class EpicGames:
 
         wpc = page.frame_locator("//iframe[@class='']")
         payment_btn = wpc.locator("//div[@class='payment-order-confirm']")
-        with suppress(Exception):
-            await expect(payment_btn).to_be_attached()
-        await page.wait_for_timeout(2000)
+        async with timed_wait("purchase_container"):
+            with suppress(Exception):
+                await expect(payment_btn).to_be_visible()
+                await expect(payment_btn).to_be_enabled()
         await payment_btn.click(timeout=6000)
 
         return wpc, payment_btn
@@ -248,141 +715,191 @@ class EpicGames:
                 return True
 
     @staticmethod
-    async def add_promotion_to_cart(page: Page, urls: List[str]) -> bool:
-        has_pending_free_promotion = False
+    async def _add_single_promotion_to_cart(page: Page, url: str) -> bool:
+        await page.goto(url, wait_until="load")
+
+        # <-- Handle pre-page
+        # with suppress(TimeoutError):
+        #     await page.click("//button//span[text()='Continue']", timeout=3000)
+
+        # 检查游戏是否已在库，一次性读取侧栏所有按钮的文本
+        texts = "".join(await page.locator("//aside//button").all_text_contents())
+
+        if "In Library" in texts:
+            logger.success(f"Already in the library - {url=}")
+            return False
+
+        # 检查是否为免费游戏
+        purchase_btn = page.locator("//aside//button[@data-testid='purchase-cta-button']")
+        purchase_status = await purchase_btn.text_content()
+        if "Buy Now" in purchase_status or "Get" not in purchase_status:
+            logger.warning(f"Not available for purchase - {url=}")
+            return False
+
+        # 将免费游戏添加至购物车
+        add_to_cart_btn = page.locator("//aside//button[@data-testid='add-to-cart-cta-button']")
+        try:
+            text = await add_to_cart_btn.text_content()
+            if text == "View In Cart":
+                logger.debug(f"🙌 Already in the shopping cart - {url=}")
+                return True
+            if text == "Add To Cart":
+                await add_to_cart_btn.click()
+                logger.debug(f"🙌 Add to the shopping cart - {url=}")
+                await expect(add_to_cart_btn).to_have_text("View In Cart")
+                return True
+        except Exception as err:
+            logger.warning(f"Failed to add promotion to cart - {err}")
+
+        return False
+
+    @staticmethod
+    @profile_phase("add_promotion_to_cart")
+    async def add_promotion_to_cart(
+        page: Page, urls: List[str], concurrency: int | None = None
+    ) -> List[str]:
+        """
+        Args:
+            page: 顺序模式下使用的页面，并发模式下在其上下文（录像时为不录像的临时上下文）中打开新的标签页
+            urls: 促销商品页链接
+            concurrency: 同时打开的标签页数量，默认读取 CART_CONCURRENT_TABS，<=1 时顺序执行
+
+        Returns: 已在购物车中等待领取的免费游戏链接，为空时说明没有需要领取的游戏
+        """
+        concurrency = concurrency or settings.CART_CONCURRENT_TABS
 
         # --> Add promotions to Cart
-        for url in urls:
-            await page.goto(url, wait_until="load")
-
-            # <-- Handle pre-page
-            # with suppress(TimeoutError):
-            #     await page.click("//button//span[text()='Continue']", timeout=3000)
-
-            # 检查游戏是否已在库
-            btn_list = page.locator("//aside//button")
-            aside_btn_count = await btn_list.count()
-            texts = ""
-            for i in range(aside_btn_count):
-                btn = btn_list.nth(i)
-                btn_text_content = await btn.text_content()
-                texts += btn_text_content
-
-            if "In Library" in texts:
-                logger.success(f"Already in the library - {url=}")
-                continue
+        if concurrency <= 1 or len(urls) <= 1:
+            return await EpicGames._add_promotions_sequentially(page, urls)
 
-            # 检查是否为免费游戏
-            purchase_btn = page.locator("//aside//button[@data-testid='purchase-cta-button']")
-            purchase_status = await purchase_btn.text_content()
-            if "Buy Now" in purchase_status or "Get" not in purchase_status:
-                logger.warning(f"Not available for purchase - {url=}")
-                continue
+        async with EpicGames._inspection_context(page) as context:
+            if context is None:
+                return await EpicGames._add_promotions_sequentially(page, urls)
 
-            # 将免费游戏添加至购物车
-            add_to_cart_btn = page.locator("//aside//button[@data-testid='add-to-cart-cta-button']")
-            try:
-                text = await add_to_cart_btn.text_content()
-                if text == "View In Cart":
-                    logger.debug(f"🙌 Already in the shopping cart - {url=}")
-                    has_pending_free_promotion = True
-                elif text == "Add To Cart":
-                    await add_to_cart_btn.click()
-                    logger.debug(f"🙌 Add to the shopping cart - {url=}")
-                    await expect(add_to_cart_btn).to_have_text("View In Cart")
-                    has_pending_free_promotion = True
+            semaphore = asyncio.Semaphore(concurrency)
 
-            except Exception as err:
-                logger.warning(f"Failed to add promotion to cart - {err}")
-                continue
+            async def _worker(url: str) -> bool:
+                async with semaphore:
+                    tab = await context.new_page()
+                    try:
+                        return await EpicGames._add_single_promotion_to_cart(tab, url)
+                    finally:
+                        with suppress(Exception):
+                            await tab.close()
+
+            results = await asyncio.gather(*[_worker(url) for url in urls], return_exceptions=True)
+
+        for url, result in zip(urls, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Failed to check promotion - {url=} err={result}")
+
+        return [url for url, result in zip(urls, results) if result is True]
+
+    @staticmethod
+    async def _add_promotions_sequentially(page: Page, urls: List[str]) -> List[str]:
+        results = [await EpicGames._add_single_promotion_to_cart(page, url) for url in urls]
+        return [url for url, result in zip(urls, results) if result]
 
-        return has_pending_free_promotion
+    @staticmethod
+    @asynccontextmanager
+    async def _inspection_context(page: Page) -> AsyncIterator[BrowserContext | None]:
+        """
+        并发检查商品页时打开标签页的上下文
 
-    async def _empty_cart(self, page: Page, wait_rerender: int = 30) -> bool | None:
+        录像上下文中的每个标签页都会单独录制一段视频，因此改用不录像的临时上下文，
+        并通过 storage_state 共享会话。持久化上下文无法派生新的上下文，返回 None 以顺序执行。
+        """
+        if not page.video:
+            yield page.context
+            return
+
+        browser = page.context.browser
+        if browser is None:
+            logger.debug("Recording persistent context, check promotions sequentially")
+            yield None
+            return
+
+        context = await browser.new_context(storage_state=await page.context.storage_state())
+        if settings.ENABLE_RESOURCE_BLOCKING:
+            await ResourceRouter().install(context)
+        try:
+            yield context
+        finally:
+            with suppress(Exception):
+                await context.close()
+
+    @profile_phase("empty_cart")
+    async def _empty_cart(self, page: Page, max_passes: int = 30) -> List[str]:
         """
         URL_CART = "https://store.epicgames.com/en-US/cart"
         URL_WISHLIST = "https://store.epicgames.com/en-US/wishlist"
         //span[text()='Your Cart is empty.']
 
+        每一轮只读取一次购物车状态，在同一次 evaluate 中将所有付费商品移入愿望单，
+        然后等待购物车重新渲染为仅包含免费商品。
+
         Args:
-            wait_rerender:
             page:
+            max_passes: 重新渲染后仍残留付费商品时的最大清理轮数，整体耗时由 CART 状态的超时兜底
 
-        Returns:
+        Returns: 被移入愿望单的商品标题
 
-        """
-        has_paid_free = False
+        Raises:
+            RuntimeError: 清理轮数耗尽后购物车中仍有付费商品，此时不能继续结账
 
-        try:
-            # Check all items in the shopping cart
-            cards = await page.query_selector_all("//div[@data-testid='offer-card-layout-wrapper']")
-
-            # Move paid games to the wishlist
-            for card in cards:
-                is_free = await card.query_selector("//span[text()='Free']")
-                if not is_free:
-                    has_paid_free = True
-                    wishlist_btn = await card.query_selector(
-                        "//button//span[text()='Move to wishlist']"
-                    )
-                    await wishlist_btn.click()
-
-            # Wait up to 60 seconds for the page to re-render.
-            # Usually it takes 1~3s for the web page to be re-rendered
-            # - Set threshold for overflow in case of poor Epic network
-            # - It can also prevent extreme situations, such as: the user’s shopping cart has nearly a hundred products
-            if has_paid_free and wait_rerender:
-                wait_rerender -= 1
-                await page.wait_for_timeout(2000)
-                return await self._empty_cart(page, wait_rerender)
-            return True
-        except TimeoutError as err:
-            logger.warning("Failed to empty shopping cart", err=err)
-            return False
+        """
+        removed: List[str] = []
 
-    async def _purchase_free_game(self):
-        # == Cart Page == #
-        await self.page.goto(URL_CART, wait_until="domcontentloaded")
+        # Wait for the cart to render either its cards or the empty hint
+        with suppress(TimeoutError):
+            await (
+                page.locator(CART_CARD_SELECTOR)
+                .or_(page.locator("//span[text()='Your Cart is empty.']"))
+                .first.wait_for(timeout=10000)
+            )
 
-        logger.debug("Move ALL paid games from the shopping cart out")
-        await self._empty_cart(self.page)
+        for _ in range(max(1, max_passes)):
+            removed.extend(await page.evaluate(JS_MOVE_PAID_CARDS_TO_WISHLIST, CART_CARD_SELECTOR))
 
-        # {{< Insert hCaptcha Challenger >}}
-        agent = AgentV(page=self.page, agent_config=settings)
+            # Usually it takes 1~3s for the web page to be re-rendered
+            try:
+                async with timed_wait("empty_cart_rerender"):
+                    await page.wait_for_function(
+                        JS_CART_ONLY_FREE, arg=CART_CARD_SELECTOR, timeout=5000
+                    )
+                break
+            except TimeoutError as err:
+                logger.warning("Cart is still re-rendering", err=err)
+        else:
+            raise RuntimeError(f"Paid games remain in the cart after {max_passes} passes")
 
-        # --> Check out cart
-        await self.page.click("//button//span[text()='Check Out']")
+        if removed:
+            logger.debug(f"Moved paid games to the wishlist - {removed}")
 
-        # <-- Handle Any LICENSE
-        await self._agree_license(self.page)
+        return removed
 
-        try:
-            # --> Move to webPurchaseContainer iframe
-            logger.debug("Move to webPurchaseContainer iframe")
-            wpc, payment_btn = await self._active_purchase_container(self.page)
-            logger.debug("Click payment button")
-            # <-- Handle UK confirm-order
-            await self._uk_confirm_order(wpc)
-
-            # {{< Active >}}
-            await agent.wait_for_challenge()
-        except Exception as err:
-            logger.warning(f"Failed to solve captcha - {err}")
-            await self.page.reload()
-            return await self._purchase_free_game()
+    async def _purchase_free_game(self) -> bool:
+        timeout = settings.PHASE_TIMEOUT_SECONDS.get("purchase_free_game") or checkout_budget()
+        async with phase("purchase_free_game", timeout=timeout):
+            return await CheckoutStateMachine(self).run()
 
     @retry(retry=retry_if_exception_type(TimeoutError), stop=stop_after_attempt(2), reraise=True)
-    async def collect_weekly_games(self, promotions: List[PromotionGame]):
+    async def collect_weekly_games(self, promotions: List[PromotionGame]) -> bool | None:
+        """
+        Returns: True 领取成功，False 领取失败，None 没有需要领取的游戏
+        """
         # --> Make sure promotion is not in the library before executing
+        self.claimed_urls = []
         urls = [p.url for p in promotions]
-        if not await self.add_promotion_to_cart(self.page, urls):
+        in_cart = await self.add_promotion_to_cart(self.page, urls)
+        if not in_cart:
             logger.success("All week-free games are already in the library")
-            return
+            return None
 
-        await self._purchase_free_game()
-
-        try:
-            await self.page.wait_for_url(URL_CART_SUCCESS)
+        if await self._purchase_free_game():
+            self.claimed_urls = in_cart
             logger.success("🎉 Successfully collected all weekly games")
-        except TimeoutError:
-            logger.warning("Failed to collect all weekly games")
+            return True
+
+        logger.warning("Failed to collect all weekly games")
+        return False
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/4 14:30
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Per-run network cost breakdown of store, cart and checkout pages
+"""
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import urlparse
+
+from loguru import logger
+from playwright.async_api import BrowserContext, Request, Response
+
+from settings import RUNTIME_DIR, settings
+
+TRACE_DIR = RUNTIME_DIR.joinpath("traces")
+
+# data: URLs and signed asset links can be very long, the summary only needs to identify them
+MAX_URL_LENGTH = 300
+
+
+class NetworkTracer:
+    """
+    Record every finished or failed request of a context and summarize
+    request counts, bytes and timings by page, domain and resource type.
+
+    Sizes come from the Content-Length header and timings from `request.timing`,
+    both are already known to the client, so no extra protocol round-trip is made.
+    """
+
+    def __init__(self, email: str, top_n: int | None = None):
+        self.email = email
+        self.top_n = top_n or settings.NETWORK_TRACE_TOP_N
+        self.started_at = time.time()
+        self.entries: List[dict] = []
+        self._sizes: Dict[Request, int] = {}
+
+    def _on_response(self, response: Response):
+        size = response.headers.get("content-length", "")
+        self._sizes[response.request] = int(size) if size.isdigit() else 0
+
+    @staticmethod
+    def _page_of(request: Request) -> str:
+        # Service worker requests have no frame
+        try:
+            return urlparse(request.frame.page.url).path or "/"
+        except Exception:
+            return ""
+
+    def _record(self, request: Request, failed: bool):
+        # responseEnd is relative to startTime, -1 when unavailable
+        duration = request.timing.get("responseEnd", -1)
+        self.entries.append(
+            {
+                "url": request.url[:MAX_URL_LENGTH],
+                "method": request.method,
+                "page": self._page_of(request),
+                "domain": urlparse(request.url).hostname or "",
+                "resource_type": request.resource_type,
+                "duration_ms": round(duration, 1) if duration >= 0 else None,
+                "bytes": self._sizes.pop(request, 0),
+                "failed": failed,
+            }
+        )
+
+    def attach(self, context: BrowserContext):
+        context.on("response", self._on_response)
+        context.on("requestfinished", lambda r: self._record(r, failed=False))
+        context.on("requestfailed", lambda r: self._record(r, failed=True))
+
+    @staticmethod
+    def _group(entries: List[dict], key: str) -> dict:
+        groups = defaultdict(lambda: {"count": 0, "bytes": 0, "duration_ms": 0.0, "failed": 0})
+        for e in entries:
+            g = groups[e[key]]
+            g["count"] += 1
+            g["bytes"] += e["bytes"]
+            g["duration_ms"] = round(g["duration_ms"] + (e["duration_ms"] or 0), 1)
+            g["failed"] += int(e["failed"])
+        return dict(sorted(groups.items(), key=lambda kv: kv[1]["duration_ms"], reverse=True))
+
+    def summary(self) -> dict:
+        timed = [e for e in self.entries if e["duration_ms"] is not None]
+        slowest = sorted(timed, key=lambda e: e["duration_ms"], reverse=True)[: self.top_n]
+        return {
+            "email": self.email,
+            "started_at": self.started_at,
+            "requests": len(self.entries),
+            "bytes": sum(e["bytes"] for e in self.entries),
+            "by_page": self._group(self.entries, "page"),
+            "by_domain": self._group(self.entries, "domain"),
+            "by_resource_type": self._group(self.entries, "resource_type"),
+            "slowest": slowest,
+        }
+
+    def dump(self, trace_dir: Path = TRACE_DIR) -> Path | None:
+        summary = self.summary()
+        path = trace_dir.joinpath(f"{self.email}-{int(self.started_at)}.json")
+        try:
+            trace_dir.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf8")
+        except OSError as err:
+            logger.warning(f"Failed to write network trace - {err}")
+            return None
+
+        logger.debug(
+            f"Network trace saved - requests={summary['requests']} "
+            f"bytes={summary['bytes']} path={path}"
+        )
+        return path
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/7/28 09:47
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Persistent per-account index of owned offers
+"""
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Iterable, List, Set, Tuple
+
+from loguru import logger
+
+from models import OrderItem, PromotionGame
+from settings import OWNERSHIP_DIR
+
+
+class OwnershipIndex:
+    """
+    每个账号一个 SQLite 文件，记录已拥有的 (namespace, offerId)
+
+    数据来源于订单历史同步与结账成功后的增量写入，仅作为“已拥有”的正向证据：
+    不在索引中的商品并不代表未拥有，需要交给浏览器流程进一步确认。
+    """
+
+    def __init__(self, email: str, db_path: Path | None = None):
+        self.email = email
+        self.db_path = db_path or OWNERSHIP_DIR.joinpath(f"{email}.sqlite3")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS owned ("
+                "namespace TEXT NOT NULL, "
+                "offer_id TEXT NOT NULL, "
+                "source TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, offer_id))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _upsert(self, rows: Iterable[Tuple[str, str]], source: str) -> int:
+        now = time.time()
+        values = [(namespace, offer_id, source, now) for namespace, offer_id in rows]
+        if not values:
+            return 0
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO owned (namespace, offer_id, source, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                values,
+            )
+        return len(values)
+
+    def add_orders(self, items: Iterable[OrderItem]) -> int:
+        return self._upsert(((i.namespace, i.offerId) for i in items), source="order_history")
+
+    def add_promotions(self, promotions: Iterable[PromotionGame], source: str = "checkout") -> int:
+        count = self._upsert(((p.namespace, p.id) for p in promotions), source=source)
+        logger.debug(f"Ownership index updated - email={self.email} {source=} {count=}")
+        return count
+
+    def namespaces(self) -> Set[str]:
+        with closing(self._connect()) as conn:
+            return {row[0] for row in conn.execute("SELECT DISTINCT namespace FROM owned")}
+
+    def offer_ids(self) -> Set[str]:
+        with closing(self._connect()) as conn:
+            return {row[0] for row in conn.execute("SELECT DISTINCT offer_id FROM owned")}
+
+    def missing(self, promotions: Iterable[PromotionGame]) -> List[PromotionGame]:
+        """Return the promotions that the index cannot prove to be owned."""
+        namespaces, offer_ids = self.namespaces(), self.offer_ids()
+        return [p for p in promotions if p.namespace not in namespaces and p.id not in offer_ids]
+
+    def owns_all(self, promotions: Iterable[PromotionGame]) -> bool:
+        """An empty list proves nothing, so it is not reported as owned."""
+        promotions = list(promotions)
+        return bool(promotions) and not self.missing(promotions)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/7/28 15:20
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Browser-free pre-flight gate before launching Camoufox
+"""
+import json
+from contextlib import suppress
+from typing import List
+
+import httpx
+from loguru import logger
+from pydantic import BaseModel
+
+from extensions.ext_metrics import record_launches_avoided
+from models import PromotionGame
+from services.epic_games_service import get_promotions
+from services.ownership_index_service import OwnershipIndex
+from settings import RUNTIME_DIR, EpicAccount
+
+PREFLIGHT_STATS_PATH = RUNTIME_DIR.joinpath("preflight_stats.json")
+
+
+class PreflightStats(BaseModel):
+    checked: int = 0
+    launches_avoided: int = 0
+    launches_required: int = 0
+
+    @classmethod
+    def load(cls) -> "PreflightStats":
+        with suppress(Exception):
+            return cls.model_validate_json(PREFLIGHT_STATS_PATH.read_text(encoding="utf8"))
+        return cls()
+
+    def dump(self):
+        with suppress(Exception):
+            PREFLIGHT_STATS_PATH.parent.mkdir(parents=True, exist_ok=True)
+            PREFLIGHT_STATS_PATH.write_text(self.model_dump_json(indent=2), encoding="utf8")
+
+
+def _claimable(promotions: List[PromotionGame]) -> List[PromotionGame]:
+    # 与 EpicAgent.collect_epic_games 保持一致，游戏捆绑内容不参与领取
+    return [p for p in promotions if "/bundles/" not in p.url]
+
+
+async def preflight(
+    accounts: List[EpicAccount], client: httpx.AsyncClient | None = None
+) -> List[EpicAccount]:
+    """
+    在启动浏览器之前，根据促销数据与本地的拥有索引筛选出仍需处理的账号
+
+    Returns: 需要启动浏览器的账号列表
+    """
+    promotions = _claimable(await get_promotions(client))
+
+    # 促销数据为空时无法证明账号已拥有全部游戏（通常是数据源故障），交给浏览器流程确认
+    if not promotions:
+        logger.warning("Promotions feed is empty or unavailable, skip preflight")
+        return accounts
+
+    pending: List[EpicAccount] = []
+    run_stats = PreflightStats()
+
+    for account in accounts:
+        run_stats.checked += 1
+        if OwnershipIndex(account.email).owns_all(promotions):
+            run_stats.launches_avoided += 1
+            logger.success(f"Nothing to claim, skip browser launch - email={account.email}")
+            continue
+        run_stats.launches_required += 1
+        pending.append(account)
+
+    record_launches_avoided(run_stats.launches_avoided)
+
+    # 累计指标跨进程持久化，Celery worker 每个任务都可能是新进程
+    total_stats = PreflightStats.load()
+    total_stats.checked += run_stats.checked
+    total_stats.launches_avoided += run_stats.launches_avoided
+    total_stats.launches_required += run_stats.launches_required
+    total_stats.dump()
+
+    logger.bind(preflight=run_stats.model_dump(), preflight_total=total_stats.model_dump()).info(
+        f"Preflight completed - {json.dumps(run_stats.model_dump())}"
+    )
+
+    return pending
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/7/31 09:36
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Keep persistent Firefox profiles compact
+"""
+import shutil
+from pathlib import Path
+from typing import List
+
+from loguru import logger
+
+from settings import settings
+
+# Profile entries that only hold caches or diagnostics and are rebuilt by Firefox on demand.
+# Cookies (cookies.sqlite), localStorage (storage/default/*/ls) and prefs are never touched.
+PRUNABLE_PROFILE_ENTRIES = [
+    "cache2",
+    "startupCache",
+    "shader-cache",
+    "thumbnails",
+    "crashes",
+    "minidumps",
+    "datareporting",
+    "saved-telemetry-pings",
+    "sessionstore-backups",
+    "safebrowsing",
+    "storage/default/*/cache",
+]
+
+
+def directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file() and not f.is_symlink())
+
+
+def prune_profile(user_data_dir: Path) -> int:
+    """Delete cache entries of the profile, return the number of bytes freed."""
+    freed = 0
+    targets: List[Path] = []
+    for pattern in PRUNABLE_PROFILE_ENTRIES:
+        targets.extend(user_data_dir.glob(pattern))
+
+    for target in targets:
+        try:
+            if target.is_dir():
+                size = directory_size(target)
+                shutil.rmtree(target)
+            else:
+                size = target.stat().st_size
+                target.unlink()
+            freed += size
+        except OSError as err:
+            logger.warning(f"Failed to prune profile entry - {target=} {err=}")
+
+    return freed
+
+
+def maybe_prune_profile(user_data_dir: Path) -> int:
+    """Prune the profile once it grows beyond PROFILE_PRUNE_THRESHOLD_MB."""
+    threshold = settings.PROFILE_PRUNE_THRESHOLD_MB * 1024 * 1024
+    if threshold <= 0 or not user_data_dir.is_dir():
+        return 0
+
+    size = directory_size(user_data_dir)
+    if size <= threshold:
+        return 0
+
+    freed = prune_profile(user_data_dir)
+    logger.debug(
+        f"Profile pruned - path={user_data_dir} "
+        f"size={size / 1024 / 1024:.1f}MB freed={freed / 1024 / 1024:.1f}MB"
+    )
+    return freed
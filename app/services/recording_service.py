@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/1 16:48
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Video recording policy and retention of RECORD_DIR
+"""
+import random
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import List
+
+from loguru import logger
+from playwright.async_api import BrowserContext, Page, Video, ViewportSize
+
+from settings import RECORD_DIR, settings
+
+
+class RecordingPolicy:
+    """
+    Decide whether a run records video, and which recordings are kept afterwards.
+
+    - off: never record
+    - always: record and keep every run
+    - sampled: record 1 in RECORD_VIDEO_SAMPLE_RATE runs
+    - on_failure: record every run, but delete the videos unless the run failed
+    """
+
+    def __init__(self, mode: str | None = None, sample_rate: int | None = None):
+        self.mode = mode or settings.RECORD_VIDEO_MODE
+        sample_rate = max(1, sample_rate or settings.RECORD_VIDEO_SAMPLE_RATE)
+
+        if self.mode == "off":
+            self.enabled = False
+        elif self.mode == "sampled":
+            self.enabled = random.randrange(sample_rate) == 0
+        else:
+            self.enabled = True
+
+        self._videos: List[Video] = []
+
+    def context_options(self) -> dict:
+        if not self.enabled:
+            return {}
+        return {
+            "record_video_dir": RECORD_DIR,
+            "record_video_size": ViewportSize(
+                width=settings.RECORD_VIDEO_WIDTH, height=settings.RECORD_VIDEO_HEIGHT
+            ),
+        }
+
+    def _track(self, page: Page):
+        if page.video:
+            self._videos.append(page.video)
+
+    def attach(self, context: BrowserContext):
+        """Track the videos of every page opened in the context."""
+        if not self.enabled:
+            return
+        for page in context.pages:
+            self._track(page)
+        context.on("page", self._track)
+
+    async def finalize(self, failed: bool):
+        """Must be called after the context is closed, when the videos are complete."""
+        if self.mode != "on_failure" or failed:
+            return
+
+        for video in self._videos:
+            with suppress(Exception):
+                await video.delete()
+        logger.debug(f"Discarded {len(self._videos)} recordings of a successful run")
+
+
+def sweep_recordings(record_dir: Path = RECORD_DIR, retention_days: int | None = None) -> int:
+    """Delete recordings older than RECORD_RETENTION_DAYS, return the number of files removed."""
+    retention_days = settings.RECORD_RETENTION_DAYS if retention_days is None else retention_days
+    if retention_days <= 0 or not record_dir.is_dir():
+        return 0
+
+    deadline = time.time() - retention_days * 86400
+    removed = 0
+    for path in record_dir.glob("*.webm"):
+        with suppress(OSError):
+            if path.stat().st_mtime < deadline:
+                path.unlink()
+                removed += 1
+
+    if removed:
+        logger.debug(f"Swept {removed} expired recordings from {record_dir}")
+    return removed
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/7/29 11:05
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Abort heavy or useless store resources at the browser context level
+"""
+from collections import Counter
+from typing import List
+from urllib.parse import urlparse
+
+from loguru import logger
+from playwright.async_api import BrowserContext, Route
+
+from settings import settings
+
+
+def _match_domain(host: str, domains: List[str]) -> bool:
+    return any(host == d or host.endswith(f".{d}") for d in domains)
+
+
+class ResourceRouter:
+    """
+    Abort images, media, fonts and analytics requests that the workflow never reads.
+
+    Requests to allowlisted domains (hCaptcha assets needed by AgentV) always pass through.
+    Note that Playwright disables the HTTP cache of a context once routing is enabled.
+    """
+
+    def __init__(
+        self,
+        blocked_resource_types: List[str] | None = None,
+        blocked_domains: List[str] | None = None,
+        allowlist: List[str] | None = None,
+    ):
+        self.blocked_resource_types = set(blocked_resource_types or settings.BLOCKED_RESOURCE_TYPES)
+        self.blocked_domains = blocked_domains or settings.BLOCKED_DOMAINS
+        self.allowlist = allowlist or settings.RESOURCE_ALLOWLIST
+
+        self.aborted = Counter()
+
+    def should_abort(self, url: str, resource_type: str) -> bool:
+        host = urlparse(url).hostname or ""
+        if _match_domain(host, self.allowlist):
+            return False
+        if resource_type in self.blocked_resource_types:
+            return True
+        return _match_domain(host, self.blocked_domains)
+
+    async def _handle(self, route: Route):
+        request = route.request
+        if self.should_abort(request.url, request.resource_type):
+            self.aborted[request.resource_type] += 1
+            await route.abort()
+        else:
+            await route.fallback()
+
+    async def install(self, context: BrowserContext):
+        await context.route("**/*", self._handle)
+        logger.debug("Resource router installed")
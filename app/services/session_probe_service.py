@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/7/30 20:12
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Lightweight, cached session validity probe
+"""
+import json
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import Dict, Tuple
+
+from loguru import logger
+from playwright.async_api import BrowserContext
+
+from settings import RUNTIME_DIR, EpicAccount, settings
+
+# An authenticated JSON endpoint, answered without rendering any store page
+URL_SESSION_PROBE = "https://www.epicgames.com/account/v2/payment/ajaxGetOrderHistory"
+
+# Cookies that carry the Epic session, the earliest expiry bounds the cache lifetime
+SESSION_COOKIE_NAMES = {"EPIC_BEARER_TOKEN", "EPIC_SESSION_AP", "EPIC_SSO", "EPIC_SSO_RM"}
+
+SESSION_CACHE_DIR = RUNTIME_DIR.joinpath("session")
+
+# The probe answers with the first order history page, reused by the order sync shortly after
+PROBE_PAGE_REUSE_SECONDS = 300
+
+
+def is_auth_failure(status: int) -> bool:
+    """An expired session is answered with 401/403 or a redirect to the login page."""
+    return status in (401, 403) or 300 <= status < 400
+
+
+class SessionProbe:
+    """
+    判断浏览器上下文中的账号会话是否有效
+
+    结果仅缓存“有效”的会话，过期时间取会话 Cookie 的最早过期时间与
+    SESSION_PROBE_MAX_TTL_SECONDS 中的较小值，授权流程与领取流程共享同一份缓存。
+    """
+
+    def __init__(self, cache_dir: Path = SESSION_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._expires_at: Dict[str, float] = {}
+        self._probe_pages: Dict[str, Tuple[float, dict]] = {}
+
+    def _cache_path(self, email: str) -> Path:
+        return self.cache_dir.joinpath(f"{email}.json")
+
+    def _load(self, email: str) -> float:
+        if email not in self._expires_at:
+            with suppress(Exception):
+                data = json.loads(self._cache_path(email).read_text(encoding="utf8"))
+                self._expires_at[email] = float(data["expires_at"])
+        return self._expires_at.get(email, 0)
+
+    def _dump(self, email: str, expires_at: float):
+        self._expires_at[email] = expires_at
+        with suppress(Exception):
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._cache_path(email).write_text(
+                json.dumps({"expires_at": expires_at}), encoding="utf8"
+            )
+
+    @staticmethod
+    async def _cookie_expiry(context: BrowserContext) -> float:
+        deadline = time.time() + settings.SESSION_PROBE_MAX_TTL_SECONDS
+        with suppress(Exception):
+            for cookie in await context.cookies("https://www.epicgames.com"):
+                expires = cookie.get("expires", -1)
+                if cookie.get("name") in SESSION_COOKIE_NAMES and expires > 0:
+                    deadline = min(deadline, expires)
+        return deadline
+
+    async def remember(self, context: BrowserContext, account: EpicAccount):
+        """Mark the session as valid, e.g. right after a successful login."""
+        self._dump(account.email, await self._cookie_expiry(context))
+
+    def invalidate(self, account: EpicAccount):
+        """Drop the cached result, e.g. when an authenticated request was rejected."""
+        self._probe_pages.pop(account.email, None)
+        self._dump(account.email, 0)
+
+    def pop_probe_page(self, account: EpicAccount) -> dict | None:
+        """The order history page answered by a recent probe, handed out once."""
+        probed_at, data = self._probe_pages.pop(account.email, (0, None))
+        return data if time.time() - probed_at < PROBE_PAGE_REUSE_SECONDS else None
+
+    async def probe(self, context: BrowserContext) -> dict | None:
+        """Return the first order history page when the session is valid."""
+        with suppress(Exception):
+            resp = await context.request.get(
+                URL_SESSION_PROBE,
+                params={"locale": "en-US", "sortDir": "DESC", "sortBy": "DATE"},
+                max_redirects=0,
+            )
+            data = await resp.json() if resp.ok else {}
+            if "orders" in data:
+                return data
+        return None
+
+    async def is_valid(
+        self, context: BrowserContext, account: EpicAccount, *, force: bool = False
+    ) -> bool:
+        if not force and self._load(account.email) > time.time():
+            logger.debug(f"Session is valid (cached) - email={account.email}")
+            return True
+
+        if (data := await self.probe(context)) is not None:
+            self._probe_pages[account.email] = (time.time(), data)
+            await self.remember(context, account)
+            logger.debug(f"Session is valid (probed) - email={account.email}")
+            return True
+
+        self.invalidate(account)
+        logger.debug(f"Session is not available - email={account.email}")
+        return False
+
+
+session_probe = SessionProbe()
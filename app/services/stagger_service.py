@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/6 16:05
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Deterministic per-account start offsets and a process-wide run gate
+"""
+
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List
+
+from loguru import logger
+from pydantic import BaseModel
+
+from settings import EpicAccount, settings
+from utils import LoopLocal
+
+
+class StaggeredRun(BaseModel):
+    email: str
+    offset: float
+    start_at: datetime
+
+
+def account_offset(email: str, window: float) -> float:
+    """
+    账号在窗口内的固定偏移（秒）
+
+    偏移只取决于邮箱，多个容器使用相同的 cron 也会稳定地错开启动时间
+    """
+    if window <= 0:
+        return 0.0
+    digest = hashlib.sha256(email.lower().encode("utf8")).digest()
+    return int.from_bytes(digest[:8], "big") % int(window * 1000) / 1000
+
+
+def plan_staggered(
+    accounts: List[EpicAccount], window: float | None = None, start: datetime | None = None
+) -> List[StaggeredRun]:
+    window = settings.STAGGER_WINDOW_SECONDS if window is None else window
+    start = start or datetime.now(timezone.utc)
+
+    plan = []
+    for account in accounts:
+        offset = account_offset(account.email, window)
+        plan.append(
+            StaggeredRun(
+                email=account.email, offset=offset, start_at=start + timedelta(seconds=offset)
+            )
+        )
+    return sorted(plan, key=lambda r: r.offset)
+
+
+def log_queue(plan: List[StaggeredRun]):
+    """输出计划的启动队列"""
+    if not plan:
+        return
+    lines = [
+        f"  {r.start_at.isoformat(timespec='seconds')}  +{r.offset:>7.1f}s  {r.email}" for r in plan
+    ]
+    logger.bind(stagger_plan=[r.model_dump(mode="json") for r in plan]).info(
+        f"Planned account queue - accounts={len(plan)} "
+        f"concurrency={settings.MAX_CONCURRENT_ACCOUNTS}\n" + "\n".join(lines)
+    )
+
+
+async def wait_until(start_at: datetime):
+    if (delay := (start_at - datetime.now(timezone.utc)).total_seconds()) > 0:
+        await asyncio.sleep(delay)
+
+
+class AccountGate:
+    """
+    进程内所有运行共享的闸门
+
+    - 全局并发上限：同时运行的账号数不超过 MAX_CONCURRENT_ACCOUNTS
+    - 账号互斥：心跳与计划运行重叠时，同一账号的浏览器配置不会被同时打开
+    """
+
+    def __init__(self, concurrency: int | None = None):
+        self.concurrency = concurrency
+
+        self._semaphore = LoopLocal(
+            lambda: asyncio.Semaphore(max(1, self.concurrency or settings.MAX_CONCURRENT_ACCOUNTS))
+        )
+        self._locks: LoopLocal[Dict[str, asyncio.Lock]] = LoopLocal(dict)
+
+    @asynccontextmanager
+    async def slot(self, email: str) -> AsyncIterator[None]:
+        async with self._locks.get().setdefault(email, asyncio.Lock()):
+            async with self._semaphore.get():
+                yield
+
+
+account_gate = AccountGate()
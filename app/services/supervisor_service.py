@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/5 10:16
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Per-account run supervisor enforcing TASK_TIMEOUT_SECONDS
+"""
+import asyncio
+import os
+import signal
+import time
+from contextlib import AbstractAsyncContextManager, AsyncExitStack, asynccontextmanager, suppress
+from pathlib import Path
+from typing import Any, AsyncIterator, Coroutine, Dict, Iterable, Set, TypeVar
+
+from loguru import logger
+
+from profiler import RunProfile
+from settings import settings
+from utils import LoopLocal
+
+T = TypeVar("T")
+
+PROC_DIR = Path("/proc")
+
+# Time granted to the cancelled run to close its pages, browser and videos
+TEARDOWN_GRACE_SECONDS = 30
+
+
+def _parent_pids() -> Dict[int, int]:
+    """Map every live pid to its parent pid by scanning /proc, empty on non-Linux hosts."""
+    parents = {}
+    for entry in PROC_DIR.glob("[0-9]*"):
+        with suppress(OSError, ValueError, IndexError):
+            # comm may contain spaces and parentheses, the fields after the last ")" are stable
+            fields = entry.joinpath("stat").read_text().rsplit(")", 1)[1].split()
+            state, ppid = fields[0], int(fields[1])
+            if state != "Z":
+                parents[int(entry.name)] = ppid
+    return parents
+
+
+def child_pids(root: int | None = None) -> Set[int]:
+    root = root or os.getpid()
+    return {pid for pid, ppid in _parent_pids().items() if ppid == root}
+
+
+def descendant_pids(roots: Iterable[int]) -> Set[int]:
+    """The roots that are still alive and every process below them."""
+    parents = _parent_pids()
+    children: Dict[int, list] = {}
+    for pid, ppid in parents.items():
+        children.setdefault(ppid, []).append(pid)
+
+    found = {root for root in roots if root in parents}
+    stack = list(found)
+    while stack:
+        for child in children.get(stack.pop(), []):
+            if child not in found:
+                found.add(child)
+                stack.append(child)
+    return found
+
+
+def kill_processes(pids: Set[int], grace: float = 5.0):
+    """SIGTERM the processes, then SIGKILL whatever survives the grace period."""
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        alive = {pid for pid in pids if PROC_DIR.joinpath(str(pid)).exists()}
+        if not alive:
+            return
+        for pid in alive:
+            with suppress(ProcessLookupError, PermissionError):
+                os.kill(pid, sig)
+        logger.warning(f"Sent {sig.name} to orphaned browser processes - pids={sorted(alive)}")
+
+        deadline = time.monotonic() + grace
+        while time.monotonic() < deadline:
+            if not any(PROC_DIR.joinpath(str(pid)).exists() for pid in alive):
+                return
+            time.sleep(0.2)
+
+
+class BrowserProcesses:
+    """
+    The processes launched by one run or one BrowserPool.
+
+    AsyncCamoufox starts its own Playwright driver as a child of this process, the browser and
+    its content processes run below that driver. Launches are serialized within the process,
+    so the children that appear during a launch belong to it, and runs that overlap in one
+    worker never reap each other's browsers.
+    """
+
+    _launch_lock = LoopLocal(asyncio.Lock)
+
+    def __init__(self):
+        self.roots: Set[int] = set()
+
+    @asynccontextmanager
+    async def launch(self, manager: AbstractAsyncContextManager[T]) -> AsyncIterator[T]:
+        """Enter the browser context manager, e.g. AsyncCamoufox, and record its processes."""
+        async with AsyncExitStack() as stack:
+            async with self._launch_lock.get():
+                before = await asyncio.to_thread(child_pids)
+                try:
+                    resource = await stack.enter_async_context(manager)
+                finally:
+                    self.roots |= await asyncio.to_thread(child_pids) - before
+            yield resource
+
+    def reap(self):
+        """Kill the recorded processes that outlived their browser."""
+        # A driver that already exited drops out, its pid may be reused by an unrelated process
+        roots = self.roots & child_pids()
+        self.roots.clear()
+        if pids := descendant_pids(roots):
+            kill_processes(pids)
+
+
+def _mark_timed_out(profile: RunProfile | None):
+    # Capture the stuck phase before cancellation unwinds it
+    if not profile:
+        return
+    stuck = profile.active[-1] if profile.active else None
+    profile.timed_out_phase = stuck or profile.timed_out_phase
+    logger.error(f"Run timed out - run_id={profile.run_id} email={profile.email} phase={stuck}")
+
+
+async def supervise(
+    coro: Coroutine[Any, Any, T],
+    *,
+    timeout: float | None = None,
+    label: str = "run",
+    profile: RunProfile | None = None,
+    processes: BrowserProcesses | None = None,
+) -> T | None:
+    """
+    Run one account under a deadline, default TASK_TIMEOUT_SECONDS.
+
+    On timeout the run is cancelled so that its context managers close pages, the browser
+    and the video recorder. Browser processes launched by this run through `processes` that
+    are still alive afterwards (or a teardown that hangs) are killed.
+
+    Args:
+        coro: the account run
+        timeout: deadline in seconds
+        label: name of the run in the logs
+        profile: the run record that receives the stuck phase
+        processes: the browsers owned by this run, browsers shared with other runs
+            (BrowserPool) are left to their owner
+
+    Returns: the result of the coroutine, None when it timed out
+    """
+    timeout = timeout or settings.TASK_TIMEOUT_SECONDS
+
+    task = asyncio.ensure_future(coro)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if task in done:
+            return task.result()
+
+        logger.error(f"Run exceeded the deadline, cancelling - {label} {timeout=}s")
+        _mark_timed_out(profile)
+        task.cancel()
+
+        done, _ = await asyncio.wait({task}, timeout=TEARDOWN_GRACE_SECONDS)
+        if task not in done and processes:
+            # A hung browser blocks its own close(), killing it lets the teardown finish
+            logger.error(f"Run teardown is stuck, killing browser processes - {label}")
+            await asyncio.to_thread(processes.reap)
+            await asyncio.wait({task}, timeout=TEARDOWN_GRACE_SECONDS)
+
+        if task.done() and not task.cancelled() and (err := task.exception()):
+            logger.opt(exception=err).warning(f"Run raised during teardown - {label}")
+        return None
+    finally:
+        if not task.done():
+            task.cancel()
+        if processes:
+            await asyncio.to_thread(processes.reap)
@@ -5,11 +5,11 @@
 @GitHub  : https://github.com/QIN2DIM
 @Desc    :
 """
-import os
 from pathlib import Path
+from typing import Dict, List, Literal
 
 from hcaptcha_challenger.agent import AgentConfig
-from pydantic import Field, SecretStr
+from pydantic import BaseModel, Field, SecretStr, model_validator
 from pydantic_settings import SettingsConfigDict
 
 PROJECT_ROOT = Path(__file__).parent
@@ -22,19 +22,39 @@ RUNTIME_DIR = VOLUMES_DIR.joinpath("runtime")
 SCREENSHOTS_DIR = VOLUMES_DIR.joinpath("screenshots")
 RECORD_DIR = VOLUMES_DIR.joinpath("record")
 HCAPTCHA_DIR = VOLUMES_DIR.joinpath("hcaptcha")
+OWNERSHIP_DIR = VOLUMES_DIR.joinpath("ownership")
+
+
+class EpicAccount(BaseModel):
+    email: str
+    password: SecretStr
+
+    @property
+    def user_data_dir(self) -> Path:
+        target_ = USER_DATA_DIR.joinpath(self.email)
+        if not target_.is_dir():
+            target_.mkdir(parents=True, exist_ok=True)
+        return target_
+
+    @property
+    def storage_state_path(self) -> Path:
+        return self.user_data_dir.joinpath("storage_state.json")
 
 
 class EpicSettings(AgentConfig):
     model_config = SettingsConfigDict(env_file=".env", env_ignore_empty=True, extra="ignore")
 
-    EPIC_EMAIL: str = Field(
-        default_factory=lambda: os.getenv("EPIC_EMAIL"),
-        description="Epic 游戏账号，需要关闭多步验证",
+    EPIC_EMAIL: str | None = Field(
+        default=None, description="Epic 游戏账号，需要关闭多步验证，与 EPIC_ACCOUNTS 二选一"
     )
 
-    EPIC_PASSWORD: SecretStr = Field(
-        default_factory=lambda: os.getenv("EPIC_PASSWORD"),
-        description=" Epic 游戏密码，需要关闭多步验证",
+    EPIC_PASSWORD: SecretStr | None = Field(
+        default=None, description=" Epic 游戏密码，需要关闭多步验证，与 EPIC_ACCOUNTS 二选一"
+    )
+
+    EPIC_ACCOUNTS: List[EpicAccount] = Field(
+        default_factory=list,
+        description='多账号列表（JSON），例如 [{"email": "a@b.com", "password": "***"}]，留空时使用 EPIC_EMAIL/EPIC_PASSWORD',
     )
 
     DISABLE_BEZIER_TRAJECTORY: bool = Field(
@@ -47,9 +67,229 @@ class EpicSettings(AgentConfig):
 
     ENABLE_APSCHEDULER: bool = Field(default=True, description="是否启用定时任务，默认启用")
 
+    SCHEDULER_MODE: Literal["cron", "promotion_window"] = Field(
+        default="cron",
+        description="cron: fixed weekly and daily triggers\n"
+        "promotion_window: run shortly after each free offer starts, plus a slow heartbeat",
+    )
+
+    PROMOTION_START_DELAY_SECONDS: int = Field(
+        default=120, description="Delay between the startDate of an offer and the planned run"
+    )
+
+    PROMOTION_JITTER_SECONDS: int = Field(
+        default=600,
+        description="Window over which the planned runs of the accounts are spread, "
+        "each account keeps a fixed offset derived from its email",
+    )
+
+    STAGGER_WINDOW_SECONDS: int = Field(
+        default=600,
+        description="Scheduled runs spread the accounts over this window with a fixed offset "
+        "derived from the email, 0 starts every account at once",
+    )
+
+    MAX_CONCURRENT_ACCOUNTS: int = Field(
+        default=2, description="Maximum number of accounts running at the same time in a process"
+    )
+
+    SCHEDULER_HEARTBEAT_HOURS: float = Field(
+        default=6,
+        description="Interval of the fallback run and window refresh in promotion_window mode",
+    )
+
     TASK_TIMEOUT_SECONDS: int = Field(
-        default=900,  # 15 minutes
-        description="Maximum execution time for browser tasks before force termination",
+        default=900,  # 15 minutes - the phase deadlines below, including checkout, fit inside
+        description="Maximum execution time of one account run before force termination",
+    )
+
+    PHASE_TIMEOUT_SECONDS: Dict[str, float] = Field(
+        default_factory=lambda: {"authorization": 300, "add_promotion_to_cart": 120},
+        description="Deadline of individual run phases, keyed by the profiler phase name. "
+        "purchase_free_game defaults to the checkout state timeouts times "
+        "CHECKOUT_MAX_RETRIES + 1 plus the backoff",
+    )
+
+    PROMOTIONS_CACHE_TTL_SECONDS: int = Field(
+        default=600,
+        description="How long the freeGamesPromotions feed is served from cache before a "
+        "conditional request is sent, 0 disables the TTL",
+    )
+
+    ENABLE_PREFLIGHT: bool = Field(
+        default=True,
+        description="Skip the browser launch when the ownership index shows that every current "
+        "free offer is already owned",
+    )
+
+    CART_CONCURRENT_TABS: int = Field(
+        default=3,
+        description="Number of product pages inspected concurrently when adding promotions to "
+        "the cart, 1 keeps the sequential single-tab behaviour",
+    )
+
+    SESSION_PROBE_MAX_TTL_SECONDS: int = Field(
+        default=3600,
+        description="Upper bound of how long a positive session probe is trusted, the actual "
+        "lifetime never exceeds the expiry of the Epic session cookies",
+    )
+
+    CHECKOUT_MAX_RETRIES: int = Field(
+        default=1,
+        description="Failed checkout states retried in total before the checkout is aborted",
+    )
+
+    CHECKOUT_BACKOFF_SECONDS: float = Field(
+        default=2.0, description="Base of the exponential backoff between checkout state retries"
+    )
+
+    # Captcha telemetry settings
+    CAPTCHA_TELEMETRY_ENABLED: bool = Field(
+        default=True,
+        description="Record type, prompt, rounds, latency and result of every hCaptcha challenge "
+        "to hcaptcha/telemetry",
+    )
+
+    CAPTCHA_ADAPTIVE_IGNORE: bool = Field(
+        default=True,
+        description="Add prompts with a poor recorded success rate to ignore_request_questions, "
+        "so the challenge is refreshed instead of attempted",
+    )
+
+    CAPTCHA_POOR_PROMPT_MIN_SAMPLES: int = Field(
+        default=5,
+        description="Recent submitted challenges required before a prompt can be skipped",
+    )
+
+    CAPTCHA_POOR_PROMPT_WINDOW: int = Field(
+        default=20, description="Latest verdicts per prompt that make up its success rate"
+    )
+
+    CAPTCHA_POOR_PROMPT_REPROBE_SECONDS: float = Field(
+        default=3 * 24 * 3600,
+        description="A skipped prompt is attempted again once its last verdict is this old",
+    )
+
+    CAPTCHA_POOR_PROMPT_MAX_SUCCESS_RATE: float = Field(
+        default=0.2, description="Prompts at or below this success rate are skipped"
+    )
+
+    # Resource blocking settings
+    ENABLE_RESOURCE_BLOCKING: bool = Field(
+        default=False,
+        description="Abort images, media, fonts and analytics requests on store pages",
+    )
+
+    BLOCKED_RESOURCE_TYPES: List[str] = Field(
+        default_factory=lambda: ["image", "media", "font"],
+        description="Playwright resource types aborted by the resource router",
+    )
+
+    BLOCKED_DOMAINS: List[str] = Field(
+        default_factory=lambda: [
+            "google-analytics.com",
+            "googletagmanager.com",
+            "doubleclick.net",
+            "facebook.net",
+            "facebook.com",
+            "tiktok.com",
+            "hotjar.com",
+            "onetrust.com",
+            "cookielaw.org",
+            "tracking.epicgames.com",
+            "datarouter.ol.epicgames.com",
+        ],
+        description="Analytics and tracker domains aborted by the resource router",
+    )
+
+    RESOURCE_ALLOWLIST: List[str] = Field(
+        default_factory=lambda: ["hcaptcha.com", "hcaptcha-assets-prod.com"],
+        description="Domains never blocked, hCaptcha assets are required by the challenger",
+    )
+
+    # Shared HTTP client settings
+    HTTP_TIMEOUT_SECONDS: float = Field(
+        default=30, description="Timeout of non-browser HTTP requests sent to Epic"
+    )
+
+    HTTP_RETRIES: int = Field(
+        default=3, description="Attempts for non-browser HTTP requests on network errors or 429/5xx"
+    )
+
+    HTTP_MAX_CONNECTIONS: int = Field(
+        default=20, description="Connection pool size of the shared HTTP client"
+    )
+
+    # Browser profile settings
+    BROWSER_PROFILE_MODE: Literal["persistent", "storage_state"] = Field(
+        default="persistent",
+        description="persistent: launch on the full Firefox profile of the account\n"
+        "storage_state: restore only cookies and localStorage into a fresh ephemeral context",
+    )
+
+    PROFILE_PRUNE_THRESHOLD_MB: int = Field(
+        default=512,
+        description="Prune caches of a persistent profile once it grows beyond this size, "
+        "0 disables pruning",
+    )
+
+    # Video recording settings
+    RECORD_VIDEO_MODE: Literal["off", "always", "sampled", "on_failure"] = Field(
+        default="always",
+        description="off: never record\n"
+        "always: record every run\n"
+        "sampled: record 1 in RECORD_VIDEO_SAMPLE_RATE runs\n"
+        "on_failure: record every run but keep the video only when the run failed",
+    )
+
+    RECORD_VIDEO_SAMPLE_RATE: int = Field(
+        default=10, description="Record 1 in N runs when RECORD_VIDEO_MODE=sampled"
+    )
+
+    RECORD_VIDEO_WIDTH: int = Field(default=1920, description="Width of the recorded video")
+
+    RECORD_VIDEO_HEIGHT: int = Field(default=1080, description="Height of the recorded video")
+
+    RECORD_RETENTION_DAYS: int = Field(
+        default=7, description="Delete recordings older than N days, 0 keeps them forever"
+    )
+
+    # Multi-account browser pool settings
+    BROWSER_POOL_PROCESSES: int = Field(
+        default=1, description="Number of Camoufox browser processes shared by all accounts"
+    )
+
+    BROWSER_POOL_CONTEXTS: int = Field(
+        default=2,
+        description="Maximum number of concurrent browser contexts (accounts) across the pool, "
+        "keep it low enough to stay under the container memory limit",
+    )
+
+    # Metrics settings
+    METRICS_MODE: Literal["off", "http", "textfile"] = Field(
+        default="off",
+        description="off: disable metrics\n"
+        "http: serve Prometheus metrics on METRICS_PORT\n"
+        "textfile: write METRICS_TEXTFILE after every run for the node_exporter textfile collector",
+    )
+
+    METRICS_PORT: int = Field(default=9464, description="Port of the Prometheus metrics endpoint")
+
+    METRICS_TEXTFILE: Path = Field(
+        default=VOLUMES_DIR.joinpath("metrics", "epic_awesome_gamer.prom"),
+        description="Output file of METRICS_MODE=textfile, "
+        "defaults to volumes/metrics/epic_awesome_gamer.prom",
+    )
+
+    # Network trace settings
+    NETWORK_TRACE_ENABLED: bool = Field(
+        default=False,
+        description="Write a per-run summary of request counts, bytes and timings "
+        "grouped by domain and resource type to runtime/traces",
+    )
+
+    NETWORK_TRACE_TOP_N: int = Field(
+        default=20, description="Number of slowest requests listed in the network trace"
     )
 
     # Celery and Redis settings
@@ -61,13 +301,24 @@ class EpicSettings(AgentConfig):
         default=1, description="Number of concurrent Celery workers"
     )
 
+    CELERY_WORKER_RECYCLE_MODE: Literal["task", "memory"] = Field(
+        default="memory",
+        description="task: respawn the worker process after every task\n"
+        "memory: keep the worker process and its event loop, "
+        "respawn it once its resident memory exceeds CELERY_WORKER_MAX_MEMORY_PER_CHILD_MB",
+    )
+
+    CELERY_WORKER_MAX_MEMORY_PER_CHILD_MB: int = Field(
+        default=1024, description="Resident memory threshold of a worker process in memory mode"
+    )
+
     CELERY_TASK_TIME_LIMIT: int = Field(
         default=1200,  # 20 minutes - slightly higher than TASK_TIMEOUT_SECONDS
         description="Celery task hard time limit in seconds",
     )
 
     CELERY_TASK_SOFT_TIME_LIMIT: int = Field(
-        default=900,  # 15 minutes - same as TASK_TIMEOUT_SECONDS
+        default=960,  # TASK_TIMEOUT_SECONDS plus the supervisor teardown grace
         description="Celery task soft time limit in seconds",
     )
 
@@ -75,12 +326,24 @@ class EpicSettings(AgentConfig):
     #     default="", description="System notification by Apprise\nhttps://github.com/caronc/apprise"
     # )
 
+    @model_validator(mode="after")
+    def _require_account(self):
+        if not self.EPIC_ACCOUNTS and not (self.EPIC_EMAIL and self.EPIC_PASSWORD):
+            raise ValueError("Set EPIC_EMAIL and EPIC_PASSWORD, or EPIC_ACCOUNTS")
+        return self
+
     @property
     def user_data_dir(self) -> Path:
-        target_ = USER_DATA_DIR.joinpath(self.EPIC_EMAIL)
-        if not target_.is_dir():
-            target_.mkdir(parents=True, exist_ok=True)
-        return target_
+        """单账号的浏览器配置目录，多账号时为第一个账号的目录"""
+        return self.accounts[0].user_data_dir
+
+    @property
+    def accounts(self) -> List[EpicAccount]:
+        if self.EPIC_ACCOUNTS:
+            return self.EPIC_ACCOUNTS
+        if self.EPIC_EMAIL and self.EPIC_PASSWORD:
+            return [EpicAccount(email=self.EPIC_EMAIL, password=self.EPIC_PASSWORD)]
+        return []
 
 
 settings = EpicSettings()
@@ -5,12 +5,19 @@
 # Description:
 from __future__ import annotations
 
+import asyncio
 import os
 import sys
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Generic, TypeVar
 from zoneinfo import ZoneInfo
 
 from loguru import logger
 
+from profiler import phase
+
+T = TypeVar("T")
+
 
 def timezone_filter(record):
     """为日志记录添加东八区时区信息"""
@@ -77,3 +84,30 @@ def init_log(**sink_channel):
             filter=timezone_filter,
         )
     return logger
+
+
+@asynccontextmanager
+async def timed_wait(label: str) -> AsyncIterator[None]:
+    """记录一次事件驱动等待的实际耗时，并计入当前运行的阶段耗时"""
+    async with phase(f"wait:{label}"):
+        yield
+
+
+class LoopLocal(Generic[T]):
+    """
+    惰性创建并按事件循环隔离的 asyncio 原语（Lock、Semaphore 等）
+
+    同一进程内的 Celery 任务、脚本中的 asyncio.run 可能先后运行在不同的事件循环上，
+    而原语只能在创建它的循环中使用，因此事件循环变化时重新创建
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._value: T | None = None
+
+    def get(self) -> T:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._value = loop, self._factory()
+        return self._value
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+@Time    : 2025/8/7 17:05
+@Author  : QIN2DIM
+@GitHub  : https://github.com/QIN2DIM
+@Desc    : Compare the cold and warm cost of creating a captcha agent
+
+Run it in a fresh interpreter, the import time is part of the cold cost:
+
+    cd app && python ../scripts/benchmark_agent_warmup.py --rounds 20
+"""
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.joinpath("app")))
+
+_import_start = time.perf_counter()
+from services.agent_factory_service import AgentFactory  # noqa: E402
+
+IMPORT_SECONDS = time.perf_counter() - _import_start
+
+import click  # noqa: E402
+from camoufox import AsyncCamoufox  # noqa: E402
+from loguru import logger  # noqa: E402
+
+
+async def benchmark(rounds: int) -> dict:
+    factory = AgentFactory()
+    warm_up_seconds = factory.warm_up()
+
+    async with AsyncCamoufox(headless=True) as browser:
+        page = await browser.new_page()
+
+        def _create() -> float:
+            start = time.perf_counter()
+            agent = factory.create(page)
+            elapsed = time.perf_counter() - start
+            page.remove_listener("response", agent._task_handler)
+            return elapsed
+
+        first_create = _create()
+        warm_creates = [_create() for _ in range(rounds)]
+
+    cold = IMPORT_SECONDS + warm_up_seconds + first_create
+    warm = statistics.mean(warm_creates)
+    return {
+        "import_seconds": round(IMPORT_SECONDS, 4),
+        "warm_up_seconds": round(warm_up_seconds, 4),
+        "first_create_seconds": round(first_create, 4),
+        "cold_total_seconds": round(cold, 4),
+        "warm_create_mean_seconds": round(warm, 6),
+        "warm_create_p95_seconds": round(sorted(warm_creates)[int(len(warm_creates) * 0.95)], 6),
+        "rounds": rounds,
+    }
+
+
+@click.command()
+@click.option("--rounds", default=20, show_default=True, help="Warm agent creations to average.")
+def main(rounds: int):
+    """Measure the per-process cold start of the captcha solver against a warm agent creation."""
+    result = asyncio.run(benchmark(max(1, rounds)))
+    for key, value in result.items():
+        logger.info(f"{key:<28} {value}")
+    saved = result["cold_total_seconds"] - result["warm_create_mean_seconds"]
+    logger.success(f"Per-run cost avoided by a warm process - {saved:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -64,15 +64,17 @@ def generate_env_example(config_class: Type[BaseSettings]) -> List[str]:
 
         # Skip complex types that shouldn't be in .env
         field_type = type_hints.get(field_name)
-        if field_type and (
-            field_type == Path or getattr(field_type, "__origin__", None) in (list, dict)
-        ):
+        if field_type and getattr(field_type, "__origin__", None) in (list, dict):
             continue
 
         # Extract description and default value
         description = field_props.get("description", "")
         default_value = field_props.get("default")
 
+        # Path defaults are absolute to the generating machine, leave them empty in the example
+        if field_type == Path:
+            default_value = None
+
         # Format the entry
         if description:
             # Add description as comment with proper wrapping
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from services.epic_games_service import EpicGames
+
+URLS = ["https://store.epicgames.com/en-US/p/a", "https://store.epicgames.com/en-US/p/b"]
+
+
+class FakeContext:
+    def __init__(self, browser=None):
+        self.browser = browser
+        self.tabs = 0
+        self.closed = False
+
+    async def new_page(self):
+        self.tabs += 1
+        return FakePage(self)
+
+    async def storage_state(self) -> dict:
+        return {"cookies": [], "origins": []}
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    async def new_context(self, **options) -> FakeContext:
+        assert "storage_state" in options
+        self.contexts.append(FakeContext(self))
+        return self.contexts[-1]
+
+
+class FakePage:
+    def __init__(self, context: FakeContext, video=None):
+        self.context = context
+        self.video = video
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def checked(monkeypatch) -> list:
+    pages = []
+
+    async def _add(page, url: str) -> bool:
+        pages.append(page)
+        return True
+
+    monkeypatch.setattr(EpicGames, "_add_single_promotion_to_cart", staticmethod(_add))
+    return pages
+
+
+def _run(page: FakePage) -> list:
+    return asyncio.run(EpicGames.add_promotion_to_cart(page, urls=URLS, concurrency=2))
+
+
+def test_tabs_share_the_context_without_recording(checked):
+    context = FakeContext(FakeBrowser())
+    page = FakePage(context)
+
+    assert _run(page) == URLS
+    assert context.tabs == 2
+    assert context.browser.contexts == []
+
+
+def test_recording_uses_a_separate_context(checked):
+    browser = FakeBrowser()
+    page = FakePage(FakeContext(browser), video=object())
+
+    assert _run(page) == URLS
+    # 录像上下文中不打开新的标签页
+    assert page.context.tabs == 0
+    assert len(browser.contexts) == 1
+    assert browser.contexts[0].tabs == 2
+    assert browser.contexts[0].closed
+
+
+def test_recording_persistent_context_is_sequential(checked):
+    page = FakePage(FakeContext(browser=None), video=object())
+
+    assert _run(page) == URLS
+    assert page.context.tabs == 0
+    assert checked == [page, page]
@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+from services import captcha_telemetry_service
+from services.captcha_telemetry_service import (
+    CaptchaSolver,
+    CaptchaTelemetryStore,
+    ChallengeRecord,
+    ChallengeRound,
+)
+from settings import settings
+
+
+class FakePage:
+    def on(self, event: str, handler):
+        pass
+
+    def remove_listener(self, event: str, handler):
+        pass
+
+
+@pytest.fixture
+def verdicts(monkeypatch, tmp_path) -> list:
+    recorded = []
+    monkeypatch.setattr(captcha_telemetry_service, "captcha_store", CaptchaTelemetryStore(tmp_path))
+    monkeypatch.setattr(
+        captcha_telemetry_service,
+        "record_captcha",
+        lambda success, latency: recorded.append(success),
+    )
+    return recorded
+
+
+def _solver() -> CaptchaSolver:
+    return CaptchaSolver(FakePage(), label="checkout", agent=object())
+
+
+@pytest.mark.parametrize(
+    "signal, success",
+    [("success", True), ("failure", False), ("challenge_execution_timeout", False)],
+)
+def test_metric_follows_solver_signal(verdicts, signal, success):
+    # AgentV 返回失败信号而不抛出异常
+    _solver()._record(started_at=0, latency=1.0, signal=signal)
+
+    assert verdicts == [success]
+
+
+def test_metric_follows_checkcaptcha_verdict(verdicts):
+    solver = _solver()
+    solver._rounds = [
+        ChallengeRound(prompt="p", passed=False),
+        ChallengeRound(prompt="p", passed=True),
+    ]
+
+    solver._record(started_at=0, latency=1.0, signal="cancelled")
+
+    assert verdicts == [True]
+
+
+def test_cancelled_without_challenge_is_not_counted(verdicts):
+    # 结账直接跳转到成功页时挑战任务被取消，没有出现人机挑战
+    _solver()._record(started_at=0, latency=1.0, signal="cancelled")
+
+    assert verdicts == []
+
+
+def _store(tmp_path, monkeypatch, window: int = 20) -> CaptchaTelemetryStore:
+    monkeypatch.setattr(settings, "CAPTCHA_POOR_PROMPT_WINDOW", window)
+    return CaptchaTelemetryStore(tmp_path)
+
+
+def _add(store: CaptchaTelemetryStore, prompt: str, *verdicts: bool | None):
+    rounds = [ChallengeRound(prompt=prompt, passed=v) for v in verdicts]
+    store.add(
+        ChallengeRecord(
+            label="checkout",
+            started_at=0,
+            latency=1.0,
+            signal="failure",
+            success=False,
+            rounds=rounds,
+        )
+    )
+
+
+def test_poor_prompts_min_samples(tmp_path, monkeypatch):
+    store = _store(tmp_path, monkeypatch)
+    _add(store, "poor", False, False, False)
+    # 未提交的轮次不计入样本
+    _add(store, "unsubmitted", None, None, None, None)
+
+    assert store.poor_prompts(min_samples=4, max_success_rate=0.2) == []
+    assert store.poor_prompts(min_samples=3, max_success_rate=0.2) == ["poor"]
+    assert store.poor_prompts(min_samples=0, max_success_rate=0.2) == ["poor"]
+
+
+def test_poor_prompts_use_recent_window(tmp_path, monkeypatch):
+    store = _store(tmp_path, monkeypatch, window=4)
+    _add(store, "recovered", *[False] * 6)
+
+    assert store.poor_prompts(min_samples=4, max_success_rate=0.5) == ["recovered"]
+
+    # 旧的失败滑出窗口后，近期的通过率决定结果
+    _add(store, "recovered", True, True, True)
+
+    stats = store.load_stats()["recovered"]
+    assert (stats.checked, stats.passed, stats.recent) == (9, 3, [False, True, True, True])
+    assert store.poor_prompts(min_samples=4, max_success_rate=0.5) == []
+
+
+def test_poor_prompts_reprobe(tmp_path, monkeypatch):
+    store = _store(tmp_path, monkeypatch)
+    _add(store, "poor", False, False, False, False, False)
+
+    assert store.poor_prompts(min_samples=5, max_success_rate=0.2, reprobe_seconds=3600) == ["poor"]
+
+    # 被跳过的提示词不会产生新的判定，最后一次判定过期后重新放行
+    now = time.time()
+    monkeypatch.setattr(captcha_telemetry_service.time, "time", lambda: now + 3601)
+    assert store.poor_prompts(min_samples=5, max_success_rate=0.2, reprobe_seconds=3600) == []
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from celery.schedules import crontab
+
+from settings import settings
+
+TASKS = [
+    "collect_epic_games_task",
+    "dispatch_collect_epic_games_task",
+    "plan_promotion_windows_task",
+    "collect_account_games_task",
+    "summarize_collect_results_task",
+]
+
+
+def test_tasks_registered():
+    from schedule.collect_epic_games_task import ext_celery_app
+
+    for name in TASKS:
+        assert f"schedule.collect_epic_games_task.{name}" in ext_celery_app.tasks
+    assert "dispatch_collect_epic_games_task" in ext_celery_app.conf.beat_schedule
+
+
+def test_cron_beat_schedule(monkeypatch):
+    from extensions.ext_celery import init_app
+
+    monkeypatch.setattr(settings, "SCHEDULER_MODE", "cron")
+    beat_schedule = init_app().conf.beat_schedule
+
+    entry = beat_schedule["dispatch_collect_epic_games_task"]
+    assert entry["task"] == "schedule.collect_epic_games_task.dispatch_collect_epic_games_task"
+    assert entry["schedule"] == crontab(minute="1", hour="*/5")
+
+
+def test_promotion_window_beat_schedule(monkeypatch):
+    from extensions.ext_celery import PROMOTION_PLANNER_INTERVAL, init_app
+
+    monkeypatch.setattr(settings, "SCHEDULER_MODE", "promotion_window")
+    beat_schedule = init_app().conf.beat_schedule
+
+    assert beat_schedule["plan_promotion_windows_task"]["schedule"] == PROMOTION_PLANNER_INTERVAL
+    assert beat_schedule["dispatch_collect_epic_games_task"]["schedule"] == timedelta(
+        hours=settings.SCHEDULER_HEARTBEAT_HOURS
+    )
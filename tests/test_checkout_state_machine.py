@@ -0,0 +1,133 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services.epic_games_service import (
+    CHECKOUT_STATE_TIMEOUTS,
+    CheckoutState,
+    CheckoutStateMachine,
+    checkout_budget,
+)
+
+
+class FakeLocator:
+    def __init__(self, count: int):
+        self._count = count
+
+    async def count(self) -> int:
+        return self._count
+
+
+class FakePage:
+    def __init__(self, iframes: int = 1):
+        self.iframes = iframes
+        self.reloads = 0
+
+    def locator(self, selector: str) -> FakeLocator:
+        return FakeLocator(self.iframes)
+
+    async def reload(self):
+        self.reloads += 1
+
+
+def _machine(page: FakePage | None = None, max_retries: int = 1) -> CheckoutStateMachine:
+    epic_games = SimpleNamespace(page=page or FakePage())
+    return CheckoutStateMachine(epic_games, max_retries=max_retries, backoff_seconds=0)
+
+
+def _script(machine: CheckoutStateMachine, outcomes: dict):
+    """Replace the state handlers, each outcome list is consumed one call at a time."""
+
+    def handler(state: CheckoutState, default: CheckoutState):
+        async def _handle():
+            queue = outcomes.get(state) or []
+            outcome = queue.pop(0) if queue else default
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        return _handle
+
+    order = list(CheckoutState)
+    for state, next_state in zip(order, order[1:]):
+        setattr(machine, f"_on_{state.value}", handler(state, next_state))
+
+
+def test_run_success():
+    machine = _machine()
+    _script(machine, {})
+
+    assert asyncio.run(machine._run())
+    assert [t["state"] for t in machine.transitions] == [
+        "cart",
+        "license",
+        "purchase_iframe",
+        "confirm",
+        "captcha",
+    ]
+
+
+def test_run_resumes_from_failed_state():
+    page = FakePage(iframes=1)
+    machine = _machine(page)
+    _script(machine, {CheckoutState.CONFIRM: [RuntimeError("detached")]})
+
+    assert asyncio.run(machine._run())
+    states = [(t["state"], t["error"] is None) for t in machine.transitions]
+    assert states[3:5] == [("confirm", False), ("confirm", True)]
+    assert page.reloads == 0
+
+
+def test_run_aborts_when_retries_are_shared():
+    machine = _machine(max_retries=1)
+    _script(
+        machine,
+        {
+            CheckoutState.LICENSE: [RuntimeError("first")],
+            CheckoutState.CONFIRM: [RuntimeError("second")],
+        },
+    )
+
+    # 两个不同状态各失败一次，已超过共享的重试次数
+    assert not asyncio.run(machine._run())
+    assert [t["state"] for t in machine.transitions if t["error"]] == ["license", "confirm"]
+
+
+def test_run_state_timeout(monkeypatch):
+    monkeypatch.setitem(CHECKOUT_STATE_TIMEOUTS, CheckoutState.CART, 0.01)
+    machine = _machine(max_retries=0)
+    _script(machine, {})
+
+    async def _hang():
+        await asyncio.sleep(10)
+
+    machine._on_cart = _hang
+
+    assert not asyncio.run(machine._run())
+    assert "TimeoutError" in machine.transitions[-1]["error"]
+
+
+@pytest.mark.parametrize(
+    "failed, iframes, expected",
+    [
+        (CheckoutState.CART, 0, CheckoutState.CART),
+        (CheckoutState.LICENSE, 0, CheckoutState.LICENSE),
+        (CheckoutState.PURCHASE_IFRAME, 0, CheckoutState.PURCHASE_IFRAME),
+        (CheckoutState.CONFIRM, 1, CheckoutState.CONFIRM),
+        (CheckoutState.CAPTCHA, 1, CheckoutState.PURCHASE_IFRAME),
+        (CheckoutState.CONFIRM, 0, CheckoutState.CART),
+        (CheckoutState.CAPTCHA, 0, CheckoutState.CART),
+    ],
+)
+def test_resume_state(failed, iframes, expected):
+    machine = _machine(FakePage(iframes=iframes))
+
+    assert asyncio.run(machine._resume_state(failed)) == expected
+
+
+def test_checkout_budget():
+    per_attempt = sum(CHECKOUT_STATE_TIMEOUTS.values())
+
+    assert checkout_budget(max_retries=0, backoff_seconds=2) == per_attempt
+    assert checkout_budget(max_retries=2, backoff_seconds=2) == per_attempt * 3 + 2 + 4
@@ -0,0 +1,44 @@
+from models import OrderItem, PromotionGame
+from services.ownership_index_service import OwnershipIndex
+
+
+def _promotion(namespace: str, offer_id: str) -> PromotionGame:
+    return PromotionGame(
+        title=offer_id,
+        id=offer_id,
+        namespace=namespace,
+        description="",
+        offerType="BASE_GAME",
+        url=f"https://store.epicgames.com/en-US/p/{offer_id}",
+    )
+
+
+def test_ownership_index_persists(tmp_path):
+    db_path = tmp_path.joinpath("a@example.com.sqlite3")
+    owned, other = _promotion("ns-owned", "offer-owned"), _promotion("ns-other", "offer-other")
+
+    OwnershipIndex("a@example.com", db_path=db_path).add_promotions([owned])
+
+    # 新实例从同一个 SQLite 文件中读取，模拟下一次运行
+    index = OwnershipIndex("a@example.com", db_path=db_path)
+    assert index.owns_all([owned])
+    assert index.missing([owned, other]) == [other]
+    assert not index.owns_all([owned, other])
+
+
+def test_ownership_index_orders(tmp_path):
+    index = OwnershipIndex("a@example.com", db_path=tmp_path.joinpath("index.sqlite3"))
+    item = OrderItem(description="", namespace="ns-order", offerId="offer-order")
+
+    assert index.add_orders([item]) == 1
+    assert index.add_orders([]) == 0
+
+    # 同一个命名空间下的其他商品同样视为已拥有
+    assert index.owns_all([_promotion("ns-order", "another-offer")])
+    assert index.namespaces() == {"ns-order"}
+
+
+def test_ownership_index_empty_list_is_not_owned(tmp_path):
+    index = OwnershipIndex("a@example.com", db_path=tmp_path.joinpath("index.sqlite3"))
+
+    assert not index.owns_all([])
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from models import PromotionGame
+from services import preflight_service
+from services.ownership_index_service import OwnershipIndex
+from services.preflight_service import PreflightStats, preflight
+from settings import EpicAccount
+
+GAME = PromotionGame(
+    title="Free Game",
+    id="offer-id",
+    namespace="offer-ns",
+    description="",
+    offerType="BASE_GAME",
+    url="https://store.epicgames.com/en-US/p/free-game",
+)
+BUNDLE = GAME.model_copy(
+    update={"id": "bundle-id", "url": "https://store.epicgames.com/en-US/bundles/free-bundle"}
+)
+
+OWNER = EpicAccount(email="owner@example.com", password="secret")
+NEWCOMER = EpicAccount(email="newcomer@example.com", password="secret")
+
+
+@pytest.fixture(autouse=True)
+def _isolate(tmp_path, monkeypatch):
+    monkeypatch.setattr(preflight_service, "PREFLIGHT_STATS_PATH", tmp_path.joinpath("stats.json"))
+    monkeypatch.setattr(
+        preflight_service,
+        "OwnershipIndex",
+        lambda email: OwnershipIndex(email, db_path=tmp_path.joinpath(f"{email}.sqlite3")),
+    )
+    preflight_service.OwnershipIndex(OWNER.email).add_promotions([GAME])
+
+
+def _feed(monkeypatch, promotions: list):
+    async def _get_promotions(client=None):
+        return promotions
+
+    monkeypatch.setattr(preflight_service, "get_promotions", _get_promotions)
+
+
+def test_preflight_skips_accounts_that_own_everything(monkeypatch):
+    # 游戏捆绑内容不参与领取，也不会阻止跳过
+    _feed(monkeypatch, [GAME, BUNDLE])
+
+    assert asyncio.run(preflight([OWNER, NEWCOMER])) == [NEWCOMER]
+
+    stats = PreflightStats.load()
+    assert (stats.checked, stats.launches_avoided, stats.launches_required) == (2, 1, 1)
+
+
+def test_preflight_stats_accumulate(monkeypatch):
+    _feed(monkeypatch, [GAME])
+
+    asyncio.run(preflight([OWNER]))
+    asyncio.run(preflight([OWNER]))
+
+    assert PreflightStats.load().launches_avoided == 2
+
+
+def test_preflight_keeps_accounts_without_promotions(monkeypatch):
+    # 数据源故障时无法证明已拥有，交给浏览器流程确认
+    _feed(monkeypatch, [BUNDLE])
+
+    assert asyncio.run(preflight([OWNER, NEWCOMER])) == [OWNER, NEWCOMER]
+    assert PreflightStats.load().checked == 0
@@ -0,0 +1,162 @@
+from datetime import datetime, timedelta, timezone
+
+from models import PromotionWindow
+from schedule.promotion_window_scheduler import plan_runs
+from services.epic_games_service import parse_promotion_windows
+from services.stagger_service import account_offset
+from settings import EpicAccount, settings
+
+
+def _element(title: str, offers: list, upcoming: list | None = None) -> dict:
+    return {
+        "title": title,
+        "id": f"{title}-id",
+        "namespace": f"{title}-ns",
+        "promotions": {
+            "promotionalOffers": [{"promotionalOffers": offers}],
+            "upcomingPromotionalOffers": [{"promotionalOffers": upcoming or []}],
+        },
+    }
+
+
+def _offer(start: str, end: str, discount: int = 0) -> dict:
+    return {"startDate": start, "endDate": end, "discountSetting": {"discountPercentage": discount}}
+
+
+def _feed(*elements: dict) -> dict:
+    return {"data": {"Catalog": {"searchStore": {"elements": list(elements)}}}}
+
+
+def test_parse_promotion_windows_utc():
+    data = _feed(
+        _element(
+            "Current",
+            [_offer("2025-03-06T16:00:00.000Z", "2025-03-13T15:00:00.000Z")],
+            upcoming=[_offer("2025-03-13T15:00:00.000Z", "2025-03-20T15:00:00.000Z")],
+        ),
+        _element(
+            "Discounted", [_offer("2025-03-06T16:00:00.000Z", "2025-03-13T15:00:00.000Z", 50)]
+        ),
+        {"title": "No promotions", "id": "x", "namespace": "x", "promotions": None},
+    )
+
+    windows = parse_promotion_windows(data)
+
+    assert [(w.title, w.upcoming) for w in windows] == [("Current", False), ("Current", True)]
+    current, upcoming = windows
+    assert current.startDate == datetime(2025, 3, 6, 16, tzinfo=timezone.utc)
+    assert current.startDate.utcoffset() == timedelta(0)
+    assert upcoming.startDate == current.endDate
+
+
+def test_parse_promotion_windows_across_dst():
+    # Epic 按美东时间 11:00 切换，美国夏令时开始后 UTC 时间提前一小时
+    data = _feed(
+        _element(
+            "Before",
+            [_offer("2025-03-06T16:00:00.000Z", "2025-03-13T15:00:00.000Z")],
+        ),
+        _element(
+            "Offset",
+            [_offer("2025-03-13T11:00:00-04:00", "2025-03-20T11:00:00-04:00")],
+        ),
+    )
+
+    before, offset = parse_promotion_windows(data)
+
+    assert before.endDate - before.startDate == timedelta(days=6, hours=23)
+    assert offset.startDate == datetime(2025, 3, 13, 15, tzinfo=timezone.utc)
+    assert offset.startDate == before.endDate
+
+
+def test_parse_promotion_windows_skips_malformed_offers():
+    data = _feed(
+        _element("Broken", [{"startDate": "not a date", "endDate": "2025-03-13T15:00:00.000Z"}]),
+        _element("Valid", [_offer("2025-03-06T16:00:00.000Z", "2025-03-13T15:00:00.000Z")]),
+    )
+
+    assert [w.title for w in parse_promotion_windows(data)] == ["Valid"]
+
+
+def _window(title: str, start: datetime) -> PromotionWindow:
+    return PromotionWindow(
+        title=title,
+        id=f"{title}-id",
+        namespace=f"{title}-ns",
+        startDate=start,
+        endDate=start + timedelta(days=7),
+    )
+
+
+def _accounts(*emails: str) -> list:
+    return [EpicAccount(email=email, password="secret") for email in emails]
+
+
+def test_plan_runs_deduplicates_shared_start():
+    now = datetime(2025, 3, 10, tzinfo=timezone.utc)
+    start = datetime(2025, 3, 13, 15, tzinfo=timezone.utc)
+    windows = [
+        _window("A", start),
+        _window("B", start),
+        _window("Next week", start + timedelta(days=7)),
+        _window("Started", now - timedelta(days=1)),
+    ]
+    accounts = _accounts("a@example.com", "b@example.com")
+
+    planned = plan_runs(windows, accounts, now=now)
+
+    assert len(planned) == 4
+    assert len({r.job_id for r in planned}) == len(planned)
+    assert [r.run_at for r in planned] == sorted(r.run_at for r in planned)
+
+    this_week = [r for r in planned if r.window_start == start]
+    assert sorted(r.email for r in this_week) == ["a@example.com", "b@example.com"]
+    assert all(r.titles == ["A", "B"] for r in this_week)
+
+
+def test_plan_runs_horizon():
+    now = datetime(2025, 3, 10, tzinfo=timezone.utc)
+    start = datetime(2025, 3, 13, 15, tzinfo=timezone.utc)
+    windows = [_window("A", start), _window("Next week", start + timedelta(days=7))]
+
+    planned = plan_runs(windows, _accounts("a@example.com"), now=now, horizon=timedelta(days=5))
+
+    assert [r.titles for r in planned] == [["A"]]
+
+
+def test_plan_runs_jitter_bounds(monkeypatch):
+    monkeypatch.setattr(settings, "PROMOTION_START_DELAY_SECONDS", 600)
+    monkeypatch.setattr(settings, "PROMOTION_JITTER_SECONDS", 1800)
+
+    now = datetime(2025, 3, 10, tzinfo=timezone.utc)
+    start = datetime(2025, 3, 13, 15, tzinfo=timezone.utc)
+    accounts = _accounts(*(f"user{i}@example.com" for i in range(50)))
+
+    planned = plan_runs([_window("A", start)], accounts, now=now)
+
+    base = start + timedelta(seconds=600)
+    jitters = [(r.run_at - base).total_seconds() for r in planned]
+    assert all(0 <= j < 1800 for j in jitters)
+    assert len(set(jitters)) > 1
+
+
+def test_plan_runs_without_jitter(monkeypatch):
+    monkeypatch.setattr(settings, "PROMOTION_START_DELAY_SECONDS", 0)
+    monkeypatch.setattr(settings, "PROMOTION_JITTER_SECONDS", 0)
+
+    now = datetime(2025, 3, 10, tzinfo=timezone.utc)
+    start = datetime(2025, 3, 13, 15, tzinfo=timezone.utc)
+
+    planned = plan_runs([_window("A", start)], _accounts("a@example.com"), now=now)
+
+    assert [r.run_at for r in planned] == [start]
+
+
+def test_account_offset_is_stable():
+    offset = account_offset("a@example.com", 3600)
+
+    assert offset == account_offset("a@example.com", 3600)
+    assert offset == account_offset("A@Example.com", 3600)
+    assert 0 <= offset < 3600
+    assert account_offset("a@example.com", 0) == 0.0
+    assert len({account_offset(f"user{i}@example.com", 3600) for i in range(20)}) > 1
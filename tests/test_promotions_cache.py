@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import httpx
+
+from services.epic_games_service import URL_PRODUCT_PAGE, PromotionsCache
+from settings import settings
+
+FEED = {
+    "data": {
+        "Catalog": {
+            "searchStore": {
+                "elements": [
+                    {
+                        "title": "Free Game",
+                        "id": "offer-id",
+                        "namespace": "offer-ns",
+                        "description": "",
+                        "offerType": "BASE_GAME",
+                        "offerMappings": [{"pageSlug": "free-game"}],
+                        "promotions": {
+                            "promotionalOffers": [
+                                {
+                                    "promotionalOffers": [
+                                        {
+                                            "startDate": "2025-03-06T16:00:00.000Z",
+                                            "endDate": "2025-03-13T15:00:00.000Z",
+                                            "discountSetting": {"discountPercentage": 0},
+                                        }
+                                    ]
+                                }
+                            ]
+                        },
+                    }
+                ]
+            }
+        }
+    }
+}
+
+
+def _fetch(cache: PromotionsCache, handler) -> list:
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await cache.get(client)
+
+    return asyncio.run(_run())
+
+
+def _seed(cache: PromotionsCache, fetched_at: float = 0):
+    cache.data_path.write_text(json.dumps(FEED), encoding="utf8")
+    cache.meta_path.write_text(
+        json.dumps({"etag": '"v1"', "last_modified": None, "fetched_at": fetched_at}),
+        encoding="utf8",
+    )
+
+
+def test_fresh_response_is_cached(tmp_path):
+    cache = PromotionsCache(cache_dir=tmp_path, ttl=3600)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=FEED, headers={"ETag": '"v1"'})
+
+    promotions = _fetch(cache, handler)
+    assert [p.url for p in promotions] == [f"{URL_PRODUCT_PAGE}free-game"]
+    assert json.loads(cache.meta_path.read_text(encoding="utf8"))["etag"] == '"v1"'
+
+    # 进程内缓存未过期，不再发送请求
+    assert _fetch(cache, handler) == promotions
+    assert len(requests) == 1
+
+
+def test_not_modified_reuses_disk_cache(tmp_path):
+    cache = PromotionsCache(cache_dir=tmp_path, ttl=3600)
+    _seed(cache)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(304)
+
+    promotions = _fetch(cache, handler)
+
+    assert [p.id for p in promotions] == ["offer-id"]
+    assert requests[0].headers["If-None-Match"] == '"v1"'
+    assert json.loads(cache.meta_path.read_text(encoding="utf8"))["fetched_at"] > 0
+
+
+def test_error_response_keeps_disk_cache(tmp_path):
+    cache = PromotionsCache(cache_dir=tmp_path, ttl=3600)
+    _seed(cache)
+
+    promotions = _fetch(cache, lambda request: httpx.Response(404, text="not found"))
+
+    assert [p.id for p in promotions] == ["offer-id"]
+    assert json.loads(cache.data_path.read_text(encoding="utf8")) == FEED
+    assert json.loads(cache.meta_path.read_text(encoding="utf8"))["fetched_at"] == 0
+
+
+def test_invalid_payload_keeps_disk_cache(tmp_path):
+    cache = PromotionsCache(cache_dir=tmp_path, ttl=3600)
+    _seed(cache)
+
+    promotions = _fetch(cache, lambda request: httpx.Response(200, json={"data": None}))
+
+    assert [p.id for p in promotions] == ["offer-id"]
+    assert json.loads(cache.data_path.read_text(encoding="utf8")) == FEED
+
+
+def test_transport_error_without_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_RETRIES", 1)
+    cache = PromotionsCache(cache_dir=tmp_path, ttl=3600)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("unreachable", request=request)
+
+    assert _fetch(cache, handler) == []
+    assert not cache.data_path.exists()
@@ -0,0 +1,48 @@
+import asyncio
+
+from services.recording_service import RecordingPolicy
+
+
+class FakeVideo:
+    def __init__(self):
+        self.deleted = False
+
+    async def delete(self):
+        self.deleted = True
+
+
+def _finalize(policy: RecordingPolicy, failed: bool) -> list:
+    videos = [FakeVideo(), FakeVideo()]
+    policy._videos.extend(videos)
+    asyncio.run(policy.finalize(failed=failed))
+    return [v.deleted for v in videos]
+
+
+def test_recording_policy_off():
+    policy = RecordingPolicy(mode="off")
+
+    assert not policy.enabled
+    assert policy.context_options() == {}
+
+
+def test_recording_policy_always_keeps_videos():
+    policy = RecordingPolicy(mode="always")
+
+    assert policy.enabled
+    assert "record_video_dir" in policy.context_options()
+    assert _finalize(policy, failed=False) == [False, False]
+
+
+def test_recording_policy_on_failure():
+    assert _finalize(RecordingPolicy(mode="on_failure"), failed=False) == [True, True]
+    assert _finalize(RecordingPolicy(mode="on_failure"), failed=True) == [False, False]
+
+
+def test_recording_policy_sampled(monkeypatch):
+    assert RecordingPolicy(mode="sampled", sample_rate=1).enabled
+
+    monkeypatch.setattr("services.recording_service.random.randrange", lambda n: n - 1)
+    assert not RecordingPolicy(mode="sampled", sample_rate=10).enabled
+
+    monkeypatch.setattr("services.recording_service.random.randrange", lambda n: 0)
+    assert RecordingPolicy(mode="sampled", sample_rate=10).enabled
@@ -0,0 +1,91 @@
+import asyncio
+import gc
+
+import pytest
+
+from services.epic_authorization_service import EpicAuthorization
+from settings import EpicAccount
+
+ACCOUNT = EpicAccount(email="a@example.com", password="secret")
+
+
+class FakeLocator:
+    def __init__(self, page: "FakePage"):
+        self.page = page
+
+    @property
+    def first(self) -> "FakeLocator":
+        return self
+
+    async def wait_for(self, state: str, timeout: float | None = None):
+        if state == "visible":
+            self.page.waits.append(timeout)
+        # Playwright 超时时抛出的异常
+        raise TimeoutError(f"Locator.wait_for: Timeout {timeout}ms exceeded")
+
+    async def is_visible(self) -> bool:
+        return False
+
+
+class FakePage:
+    def __init__(self):
+        self.waits = []
+
+    async def goto(self, url: str, **kwargs):
+        return None
+
+    def locator(self, selector: str) -> FakeLocator:
+        return FakeLocator(self)
+
+
+def _run(coro) -> list:
+    """Run the coroutine and return the errors reported to the loop exception handler."""
+    errors = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda _, ctx: errors.append(ctx))
+        try:
+            await coro
+        finally:
+            gc.collect()
+            await asyncio.sleep(0)
+
+    asyncio.run(main())
+    return errors
+
+
+def test_validation_is_bounded_by_max_rounds():
+    page = FakePage()
+    agent = EpicAuthorization(page, account=ACCOUNT)
+
+    async def validate():
+        with pytest.raises(TimeoutError):
+            await agent._handle_right_account_validation(timeout=60, max_rounds=3)
+
+    errors = _run(validate())
+
+    assert len(page.waits) == 3
+    # 每轮的按钮等待都带有不超过总时限的显式超时
+    assert all(0 < t <= 60_000 for t in page.waits)
+    assert not errors
+
+
+def test_validation_is_bounded_by_timeout():
+    page = FakePage()
+    agent = EpicAuthorization(page, account=ACCOUNT)
+
+    async def validate():
+        with pytest.raises(TimeoutError):
+            await agent._handle_right_account_validation(timeout=0, max_rounds=3)
+
+    assert not _run(validate())
+    assert not page.waits
+
+
+def test_refreshed_csrf_ends_validation():
+    page = FakePage()
+    agent = EpicAuthorization(page, account=ACCOUNT)
+    agent._is_refresh_csrf_signal.put_nowait({"success": True})
+
+    assert not _run(agent._handle_right_account_validation(max_rounds=3))
+    assert not page.waits
@@ -0,0 +1,71 @@
+import asyncio
+
+from services.session_probe_service import SessionProbe, is_auth_failure
+from settings import EpicAccount
+
+PAGE = {"orders": [], "nextPageToken": None}
+
+
+class FakeResponse:
+    def __init__(self, status: int, data: dict | None = None):
+        self.status = status
+        self.ok = 200 <= status < 300
+        self._data = data or {}
+
+    async def json(self) -> dict:
+        return self._data
+
+
+class FakeContext:
+    def __init__(self, response: FakeResponse):
+        self.response = response
+        self.calls = 0
+        self.request = self
+
+    async def get(self, url: str, **kwargs) -> FakeResponse:
+        self.calls += 1
+        return self.response
+
+    async def cookies(self, url: str) -> list:
+        return []
+
+
+ACCOUNT = EpicAccount(email="a@example.com", password="secret")
+
+
+def test_positive_probe_is_cached(tmp_path):
+    probe = SessionProbe(cache_dir=tmp_path)
+    context = FakeContext(FakeResponse(200, PAGE))
+
+    assert asyncio.run(probe.is_valid(context, ACCOUNT))
+    assert asyncio.run(probe.is_valid(context, ACCOUNT))
+    assert context.calls == 1
+
+    # 新实例从磁盘读取缓存
+    assert asyncio.run(SessionProbe(cache_dir=tmp_path).is_valid(context, ACCOUNT))
+    assert context.calls == 1
+
+
+def test_probe_page_is_handed_out_once(tmp_path):
+    probe = SessionProbe(cache_dir=tmp_path)
+    asyncio.run(probe.is_valid(FakeContext(FakeResponse(200, PAGE)), ACCOUNT))
+
+    assert probe.pop_probe_page(ACCOUNT) == PAGE
+    assert probe.pop_probe_page(ACCOUNT) is None
+
+
+def test_invalidate_forces_probe(tmp_path):
+    probe = SessionProbe(cache_dir=tmp_path)
+    asyncio.run(probe.is_valid(FakeContext(FakeResponse(200, PAGE)), ACCOUNT))
+
+    probe.invalidate(ACCOUNT)
+
+    context = FakeContext(FakeResponse(302))
+    assert not asyncio.run(SessionProbe(cache_dir=tmp_path).is_valid(context, ACCOUNT))
+    assert context.calls == 1
+    assert probe.pop_probe_page(ACCOUNT) is None
+
+
+def test_is_auth_failure():
+    assert all(is_auth_failure(status) for status in (301, 302, 401, 403))
+    assert not any(is_auth_failure(status) for status in (200, 404, 429, 500))
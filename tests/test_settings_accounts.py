@@ -0,0 +1,33 @@
+import pytest
+from pydantic import ValidationError
+
+from settings import EpicSettings
+
+
+@pytest.fixture(autouse=True)
+def _no_account_env(monkeypatch):
+    for name in ("EPIC_EMAIL", "EPIC_PASSWORD", "EPIC_ACCOUNTS"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_single_account():
+    settings = EpicSettings(EPIC_EMAIL="a@example.com", EPIC_PASSWORD="secret")
+
+    assert [a.email for a in settings.accounts] == ["a@example.com"]
+    assert settings.user_data_dir.name == "a@example.com"
+
+
+def test_accounts_without_single_pair(monkeypatch):
+    monkeypatch.setenv("EPIC_ACCOUNTS", '[{"email": "b@example.com", "password": "secret"}]')
+
+    settings = EpicSettings()
+
+    assert settings.EPIC_EMAIL is None
+    assert [a.email for a in settings.accounts] == ["b@example.com"]
+    assert settings.user_data_dir.name == "b@example.com"
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"EPIC_EMAIL": "a@example.com"}, {"EPIC_ACCOUNTS": []}])
+def test_account_required(kwargs):
+    with pytest.raises(ValidationError):
+        EpicSettings(**kwargs)
@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from services.stagger_service import AccountGate, account_offset, plan_staggered
+from settings import EpicAccount
+
+
+def _accounts(*emails: str) -> list:
+    return [EpicAccount(email=email, password="secret") for email in emails]
+
+
+def test_plan_staggered_offsets():
+    start = datetime(2025, 3, 13, 15, tzinfo=timezone.utc)
+    accounts = _accounts(*(f"user{i}@example.com" for i in range(10)))
+
+    plan = plan_staggered(accounts, window=600, start=start)
+
+    assert sorted(r.email for r in plan) == sorted(a.email for a in accounts)
+    assert [r.offset for r in plan] == sorted(r.offset for r in plan)
+    for r in plan:
+        assert r.offset == account_offset(r.email, 600)
+        assert r.start_at == start + timedelta(seconds=r.offset)
+
+
+def test_plan_staggered_without_window():
+    start = datetime(2025, 3, 13, 15, tzinfo=timezone.utc)
+
+    plan = plan_staggered(_accounts("a@example.com", "b@example.com"), window=0, start=start)
+
+    assert all(r.offset == 0 and r.start_at == start for r in plan)
+
+
+async def _track(gate: AccountGate, email: str, active: dict, peak: dict):
+    async with gate.slot(email):
+        active[email] = active.get(email, 0) + 1
+        peak["total"] = max(peak.get("total", 0), sum(active.values()))
+        peak[email] = max(peak.get(email, 0), active[email])
+        await asyncio.sleep(0.01)
+        active[email] -= 1
+
+
+def test_account_gate_limits_concurrency():
+    gate = AccountGate(concurrency=2)
+    active, peak = {}, {}
+
+    async def _run():
+        await asyncio.gather(
+            *(_track(gate, f"user{i}@example.com", active, peak) for i in range(6))
+        )
+
+    asyncio.run(_run())
+
+    assert peak["total"] == 2
+
+
+def test_account_gate_serializes_one_account():
+    gate = AccountGate(concurrency=4)
+    active, peak = {}, {}
+
+    async def _run():
+        await asyncio.gather(*(_track(gate, "a@example.com", active, peak) for _ in range(3)))
+
+    asyncio.run(_run())
+
+    assert peak["a@example.com"] == 1
+
+
+def test_account_gate_survives_new_event_loops():
+    gate = AccountGate(concurrency=1)
+    active, peak = {}, {}
+
+    # Celery worker 与 deploy 每次运行都可能使用新的事件循环
+    for _ in range(2):
+        asyncio.run(_track(gate, "a@example.com", active, peak))
+
+    assert peak["total"] == 1
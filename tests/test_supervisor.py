@@ -0,0 +1,80 @@
+import asyncio
+
+from profiler import phase, run_profile
+from services import supervisor_service
+from services.epic_games_service import checkout_budget
+from services.supervisor_service import supervise
+from settings import settings
+
+
+class FakeProcesses:
+    def __init__(self):
+        self.reaped = 0
+
+    def reap(self):
+        self.reaped += 1
+
+
+async def _stuck(name: str = "checkout"):
+    async with phase(name):
+        await asyncio.sleep(10)
+
+
+async def _ignores_cancel():
+    # 模拟卡死的浏览器：取消后仍需一段时间才能结束
+    try:
+        await asyncio.sleep(10)
+    except asyncio.CancelledError:
+        await asyncio.sleep(0.2)
+
+
+def test_supervise_returns_result():
+    async def _run():
+        return True
+
+    processes = FakeProcesses()
+
+    assert asyncio.run(supervise(_run(), timeout=1, processes=processes)) is True
+    assert processes.reaped == 1
+
+
+def test_supervise_timeout_returns_none():
+    assert asyncio.run(supervise(_stuck(), timeout=0.05)) is None
+
+
+def test_supervise_marks_stuck_phase():
+    async def _run():
+        with run_profile("a@example.com") as profile:
+            result = await supervise(_stuck("authorization"), timeout=0.05, profile=profile)
+        return result, profile
+
+    result, profile = asyncio.run(_run())
+
+    assert result is None
+    assert profile.timed_out_phase == "authorization"
+    assert profile.active == []
+
+
+def test_supervise_without_processes_does_not_reap(monkeypatch):
+    killed = []
+    monkeypatch.setattr(supervisor_service, "kill_processes", killed.append)
+    monkeypatch.setattr(supervisor_service, "TEARDOWN_GRACE_SECONDS", 0.05)
+
+    assert asyncio.run(supervise(_ignores_cancel(), timeout=0.05)) is None
+    assert killed == []
+
+
+def test_supervise_reaps_stuck_teardown(monkeypatch):
+    monkeypatch.setattr(supervisor_service, "TEARDOWN_GRACE_SECONDS", 0.05)
+    processes = FakeProcesses()
+
+    assert asyncio.run(supervise(_ignores_cancel(), timeout=0.05, processes=processes)) is None
+    # 一次在 teardown 卡住时，一次在 finally 中
+    assert processes.reaped == 2
+
+
+def test_phase_deadlines_fit_task_timeout():
+    phases = settings.PHASE_TIMEOUT_SECONDS
+    budget = phases["authorization"] + phases["add_promotion_to_cart"] + checkout_budget()
+
+    assert budget < settings.TASK_TIMEOUT_SECONDS